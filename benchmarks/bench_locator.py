@@ -0,0 +1,58 @@
+# Benchmark: locating modified entries in a .pk (naive scan vs AssetLocator)
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from redcon_locator import AssetLocator
+from synthetic_pk import build_pk
+
+
+def naive_find(pk_data: bytes, target: bytes) -> int:
+    """The original byte-by-byte search from save_worker, kept for comparison."""
+    for i in range(len(pk_data) - len(target) + 1):
+        if pk_data[i:i + len(target)] == target:
+            return i
+    return -1
+
+
+def build_archive(entry_count: int, entry_size: int, seed: int = 0):
+    """A WebP-only synthetic archive of entry_count entries; returns (data, [(offset, blob)])."""
+    data, entries = build_pk(0, webp_ratio=1.0, webp_size=(entry_size, entry_size), junk_size=(0, 64),
+                             seed=seed, entry_count=entry_count)
+    return data, [(e.offset, data[e.offset:e.offset + e.size]) for e in entries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time locating modified entries in a synthetic .pk")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024], help="entry counts to try")
+    parser.add_argument("--entry-size", type=int, default=4096)
+    parser.add_argument("--modified", type=int, default=20, help="entries to resolve per run")
+    parser.add_argument("--naive-limit", type=int, default=256, help="skip the naive scan above this entry count")
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'archive MB':>11} {'naive s':>9} {'locator s':>10}")
+    for count in args.sizes:
+        pk_data, entries = build_archive(count, args.entry_size)
+        # Worst case for the old path: entries near the end, stored offsets stale
+        targets = entries[-args.modified:]
+
+        naive = float("nan")
+        if count <= args.naive_limit:
+            start = time.perf_counter()
+            for off, blob in targets:
+                assert naive_find(pk_data, blob) == off
+            naive = time.perf_counter() - start
+
+        start = time.perf_counter()
+        locator = AssetLocator(pk_data)
+        found = locator.locate_all({str(off): (blob, None) for off, blob in targets})
+        assert all(found[str(off)] == off for off, _ in targets)
+        indexed = time.perf_counter() - start
+
+        print(f"{count:>8} {len(pk_data) / 1e6:>11.2f} {naive:>9.3f} {indexed:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# Benchmark suite: scan, extract, locate, save and convert on a synthetic (or real) .pk
+#
+#   python benchmarks/bench_suite.py --size-mb 64 -o before.json
+#   python benchmarks/bench_suite.py --size-mb 64 -o after.json --compare before.json
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import redcon_ogg_extractor as oggex
+import redcon_webp_extractor as webpex
+from redcon_archive import PkArchive, write_patched_copy
+from redcon_convert import ConversionCache, cached_convert, convert_file
+from redcon_events import EventChannel
+from redcon_scanner import KIND_FILE_TYPES, iter_entries
+from redcon_verify import verify_buffer
+from synthetic_pk import write_pk
+
+RESULTS_FORMAT = 1
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def summarize(runs: List[float], nbytes: int = 0) -> dict:
+    best = min(runs)
+    result = {"runs": runs, "best": best, "median": statistics.median(runs)}
+    if nbytes:
+        result["mb_per_s"] = nbytes / best / 1e6
+    return result
+
+
+def environment() -> dict:
+    env = {"python": platform.python_version(), "implementation": platform.python_implementation(),
+           "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()}
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                       text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        env["commit"] = None
+    return env
+
+
+def headless_tool():
+    """A GameModdingTool with no window, enough to run its scan/locate/save helpers.
+
+    Returns None when tkinter is missing (the GUI module cannot be imported).
+    """
+    try:
+        from cannonloader import GameModdingTool
+    except ImportError:
+        return None
+    tool = GameModdingTool.__new__(GameModdingTool)
+    tool.events = EventChannel()
+    tool.log_message = lambda message: None
+    return tool
+
+
+def modified_entries(buf, entries, count: int, stale: bool, seed: int) -> List[tuple]:
+    """(name, file_info) pairs replacing the last count entries with smaller random data."""
+    rng = random.Random(seed)
+    chosen = entries[-count:] if count else []
+    out = []
+    for i, (offset, size, file_type) in enumerate(chosen):
+        original = bytes(buf[offset:offset + size])
+        info = {'data': rng.randbytes(max(1, size - rng.randint(0, size // 4))), 'original_data': original,
+                'offset': None if stale else offset, 'type': file_type}
+        out.append((f"entry_{i:04}", info))
+    return out
+
+
+def conversion_inputs(directory: str) -> Dict[str, Optional[str]]:
+    """Sample source files per target type, or None (with the reason) when its encoder is unavailable."""
+    inputs = {}
+    try:
+        from PIL import Image
+        path = os.path.join(directory, "sample.png")
+        rng = random.Random(1)
+        img = Image.new("RGBA", (512, 512))
+        img.putdata([(rng.randrange(256), rng.randrange(256), 128, 255) for _ in range(512 * 512)])
+        img.save(path)
+        inputs["Image"] = path
+    except ImportError:
+        inputs["Image"] = None
+    try:
+        import pydub  # noqa: F401
+        if shutil.which("ffmpeg") is None:
+            raise ImportError("ffmpeg not found")
+        import wave
+        path = os.path.join(directory, "sample.wav")
+        with wave.open(path, "wb") as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(random.Random(2).randbytes(44100 * 4 * 5))
+        inputs["Audio"] = path
+    except ImportError:
+        inputs["Audio"] = None
+    return inputs
+
+
+def run_suite(pk_path: str, workdir: str, repeat: int, lookups: int, modified: int, seed: int,
+              convert: bool) -> Dict[str, dict]:
+    results = {}
+    size = os.path.getsize(pk_path)
+
+    def bench(name: str, fn: Callable[[], object], nbytes: int = 0, times: int = repeat):
+        results[name] = summarize(timed(fn, times), nbytes)
+        print(f"  {name:<28} best {results[name]['best'] * 1000:9.1f} ms")
+
+    def skip(name: str, reason: str):
+        results[name] = {"skipped": reason}
+        print(f"  {name:<28} skipped ({reason})")
+
+    tool = headless_tool()
+    with PkArchive(pk_path) as archive:
+        buf = archive.buffer
+        entries = [(rec.offset, rec.size, KIND_FILE_TYPES[rec.kind]) for rec in iter_entries(buf)]
+        bench("scan.all", lambda: sum(1 for _ in iter_entries(buf)), size)
+        bench("verify.all", lambda: verify_buffer(buf), size)
+        if tool is None:
+            for name in ("scan.webp", "scan.ogg", "locate.find", "save.patch", "save.patch_stale"):
+                skip(name, "tkinter unavailable")
+        else:
+            bench("scan.webp", lambda: tool._find_webp_entries(buf), size)
+            bench("scan.ogg", lambda: tool._find_ogg_entries(buf), size)
+            # Entries near the end: the worst case for a forward search
+            targets = [bytes(buf[off:off + n]) for off, n, _ in entries[-lookups:]]
+            bench("locate.find", lambda: [tool.find_file_offsets_in_pk(buf, t) for t in targets], size * len(targets))
+
+    bench("extract.webp", lambda: webpex.extract_webp_images(pk_path, os.path.join(workdir, "webp"), verbose=False), size)
+    bench("extract.ogg", lambda: oggex.extract_ogg_files(pk_path, os.path.join(workdir, "ogg"), verbose=False), size)
+
+    if tool is not None:
+        # save_worker minus the dialogs: build the patches, then write the patched copy
+        out_path = os.path.join(workdir, "saved.pk")
+        with PkArchive(pk_path) as archive:
+            fresh = modified_entries(archive.buffer, entries, modified, stale=False, seed=seed)
+            stale = modified_entries(archive.buffer, entries, modified, stale=True, seed=seed)
+
+        def save(entries_: List[tuple]):
+            patches, _ = tool._build_patches(pk_path, entries_)
+            write_patched_copy(pk_path, out_path, patches)
+            tool.events.drain()
+
+        bench("save.patch", lambda: save(fresh), size)
+        bench("save.patch_stale", lambda: save(stale), size)
+        del fresh, stale
+
+    if not convert:
+        return results
+    cache = ConversionCache(os.path.join(workdir, "cache"))
+    for file_type, path in conversion_inputs(workdir).items():
+        name = f"convert.{'webp' if file_type == 'Image' else 'ogg'}"
+        if path is None:
+            skip(name, "encoder unavailable")
+            skip(name + ".cached", "encoder unavailable")
+            continue
+        bench(name, lambda: convert_file(path, file_type), os.path.getsize(path))
+        cached_convert(path, file_type, cache)
+        bench(name + ".cached", lambda: cached_convert(path, file_type, cache), os.path.getsize(path))
+    return results
+
+
+def print_comparison(results: Dict[str, dict], previous: dict):
+    print(f"\n{'benchmark':<28} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, result in results.items():
+        old = previous.get("results", {}).get(name, {})
+        if "best" not in result or "best" not in old:
+            continue
+        print(f"{name:<28} {old['best'] * 1000:>10.1f} {result['best'] * 1000:>10.1f} {old['best'] / result['best']:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the scan, extract, locate, save and convert paths")
+    parser.add_argument("--pk", help="benchmark this archive instead of a synthetic one")
+    parser.add_argument("--size-mb", type=float, default=32, help="synthetic archive size")
+    parser.add_argument("--webp-ratio", type=float, default=0.5, help="fraction of synthetic entries that are WebP")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=20, help="entries to locate in locate.find")
+    parser.add_argument("--modified", type=int, default=20, help="entries replaced in save.*")
+    parser.add_argument("--no-convert", action="store_true", help="skip the conversion benchmarks")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cannonloader-bench-") as workdir:
+        parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+        if args.pk:
+            pk_path = args.pk
+        else:
+            pk_path = os.path.join(workdir, "synthetic.pk")
+            start = time.perf_counter()
+            write_pk(pk_path, int(args.size_mb * 1e6), webp_ratio=args.webp_ratio, seed=args.seed)
+            print(f"Generated {os.path.getsize(pk_path) / 1e6:.1f} MB archive in {time.perf_counter() - start:.1f} s")
+        with PkArchive(pk_path) as archive:
+            kinds = [rec.kind for rec in iter_entries(archive.buffer)]
+        archive_info = {"path": args.pk, "bytes": os.path.getsize(pk_path),
+                        "entries": {kind: kinds.count(kind) for kind in sorted(set(kinds))}}
+        results = run_suite(pk_path, workdir, args.repeat, args.lookups, args.modified, args.seed, not args.no_convert)
+
+    report = {"format": RESULTS_FORMAT, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+              "environment": environment(), "parameters": parameters, "archive": archive_info, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
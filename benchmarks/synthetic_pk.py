@@ -0,0 +1,146 @@
+# Synthetic .pk archives for benchmarks (no game files needed)
+import argparse
+import os
+import random
+import struct
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ARCHIVE_HEADER = b"\xa9 HEXAGE"
+SIGNATURES = (b"RIFF", b"OggS")
+
+
+class SyntheticEntry(NamedTuple):
+    offset: int
+    size: int
+    kind: str  # 'webp' or 'ogg'
+
+
+def _crc_table() -> List[int]:
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(page: bytes) -> int:
+    """Ogg page checksum (CRC-32, polynomial 0x04C11DB7, no reflection)."""
+    crc = 0
+    for b in page:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ b]
+    return crc
+
+
+def ogg_page(packet: bytes, granule: int, serial: int, sequence: int, flags: int = 0) -> bytes:
+    """One page holding one complete packet, with a valid checksum."""
+    lacing = [255] * (len(packet) // 255) + [len(packet) % 255]
+    header = struct.pack("<4sBBqIIIB", b"OggS", 0, flags, granule, serial, sequence, 0, len(lacing)) + bytes(lacing)
+    page = bytearray(header + packet)
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def vorbis_id_packet(rate: int, channels: int, bitrate: int) -> bytes:
+    return (b"\x01vorbis" + struct.pack("<IBIiii", 0, channels, rate, 0, bitrate, 0)
+            + bytes([0xB8, 0x01]))  # blocksizes 256/2048, framing bit
+
+
+def make_ogg(rng: random.Random, serial: int, pages: int, page_size: int) -> bytes:
+    """A multi-page Vorbis-shaped stream: id header, then random audio pages, EOS last."""
+    rate = rng.choice((22050, 44100, 48000))
+    channels = rng.choice((1, 2))
+    out = [ogg_page(vorbis_id_packet(rate, channels, rng.choice((64000, 96000, 140000))), 0, serial, 0, flags=0x02)]
+    granule = 0
+    for seq in range(1, pages + 1):
+        granule += rate // 10
+        flags = 0x04 if seq == pages else 0
+        out.append(ogg_page(rng.randbytes(rng.randint(page_size // 2, page_size)), granule, serial, seq, flags))
+    return b"".join(out)
+
+
+def make_webp(rng: random.Random, size: int) -> bytes:
+    """A RIFF/WEBP block with a VP8L header (so metadata parses) and random body."""
+    width, height = rng.randint(16, 2048), rng.randint(16, 2048)
+    bits = (width - 1) | ((height - 1) << 14) | (rng.randint(0, 1) << 28)
+    body = bytes([0x2F]) + struct.pack("<I", bits) + rng.randbytes(max(0, size - 25))
+    if len(body) % 2:
+        body += b"\0"
+    chunk = b"VP8L" + struct.pack("<I", len(body)) + body
+    return b"RIFF" + struct.pack("<I", 4 + len(chunk)) + b"WEBP" + chunk
+
+
+def junk(rng: random.Random, size: int) -> bytes:
+    """Random filler with every real signature scrubbed, plus an occasional RIFF decoy."""
+    data = bytearray(rng.randbytes(size))
+    for sig in SIGNATURES:
+        pos = data.find(sig)
+        while pos != -1:
+            data[pos] ^= 0xFF
+            pos = data.find(sig, pos + 1)
+    if size >= 12 and rng.random() < 0.3:
+        # Non-WEBP RIFF the scanner has to look at and skip
+        data[0:12] = b"RIFF" + struct.pack("<I", 4) + b"AVI "
+    return bytes(data)
+
+
+def build_pk(target_bytes: int, webp_ratio: float = 0.5, webp_size: Tuple[int, int] = (4096, 65536),
+             ogg_pages: Tuple[int, int] = (4, 40), ogg_page_size: int = 4096, junk_size: Tuple[int, int] = (0, 256),
+             seed: int = 0, entry_count: Optional[int] = None,
+             duplicates: float = 0.0) -> Tuple[bytes, List[SyntheticEntry]]:
+    """Build an archive of about target_bytes (or exactly entry_count entries); returns its bytes and entries.
+
+    duplicates is the fraction of entries that repeat an earlier entry byte for byte.
+    """
+    rng = random.Random(seed)
+    parts = [ARCHIVE_HEADER]
+    entries = []
+    pos = len(ARCHIVE_HEADER)
+    serial = 1
+    blobs = []
+    while (pos < target_bytes) if entry_count is None else (len(entries) < entry_count):
+        if blobs and rng.random() < duplicates:
+            blob, kind = rng.choice(blobs)
+        elif rng.random() < webp_ratio:
+            blob, kind = make_webp(rng, rng.randint(*webp_size)), "webp"
+        else:
+            blob, kind = make_ogg(rng, serial, rng.randint(*ogg_pages), ogg_page_size), "ogg"
+            serial += 1
+        blobs.append((blob, kind))
+        entries.append(SyntheticEntry(pos, len(blob), kind))
+        pad = junk(rng, rng.randint(*junk_size))
+        parts += [blob, pad]
+        pos += len(blob) + len(pad)
+    return b"".join(parts), entries
+
+
+def write_pk(path: str, target_bytes: int, **kwargs) -> List[SyntheticEntry]:
+    data, entries = build_pk(target_bytes, **kwargs)
+    with open(path, "wb") as f:
+        f.write(data)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic .pk archive")
+    parser.add_argument("output")
+    parser.add_argument("--size-mb", type=float, default=32)
+    parser.add_argument("--webp-ratio", type=float, default=0.5, help="fraction of entries that are WebP")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of entries repeating an earlier one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    entries = write_pk(args.output, int(args.size_mb * 1e6), webp_ratio=args.webp_ratio, seed=args.seed,
+                       duplicates=args.duplicates)
+    kinds = {kind: sum(1 for e in entries if e.kind == kind) for kind in ("webp", "ogg")}
+    print(f"Wrote {args.output}: {os.path.getsize(args.output)} bytes, {kinds['webp']} WebP, {kinds['ogg']} Ogg")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,155 @@
+import time
+_LAUNCHED = time.perf_counter()  # origin of the startup report, taken before the heavy imports
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
-from typing import Dict, List, Tuple
-import struct
+import sys
+from typing import Dict, List, Optional, Tuple
 import redcon_webp_extractor as webpex
 import redcon_ogg_extractor as oggex
-from PIL import Image, ImageTk
-import pygame
+from redcon_archive import PkArchive, replace_file, slot_patches, write_patched_copy
+from redcon_convert import BulkConverter, ConversionCache, ConversionJob, cached_convert, describe_settings, fit_to_slot, match_replacements
+from redcon_dedup import DedupIndex
+from redcon_events import EventChannel, ProgressMeter
+from redcon_history import EditHistory
+from redcon_index import hash_entry, invalidate_index
+from redcon_locator import AssetLocator
+from redcon_metadata import asset_metadata, format_details, format_dimensions, format_duration
+from redcon_patch import PATCH_SUFFIX, apply_patch, write_patch
+from redcon_preview import SoundCache, ThumbnailCache
+from redcon_startup import StartupTimer
+from redcon_trace import enable_from_env, span, traced
+from redcon_verify import describe, repair_ogg_crcs, verify_file, verify_patches
+from redcon_scanner import FILE_TYPE_KINDS, classify, entry_name, iter_ogg_entries, iter_webp_entries
+from redcon_workspace import Workspace, find_archives, scan_file, scan_files
 import threading
-import io
-from pydub import AudioSegment
+import multiprocessing
 import tempfile
 import atexit
 
 class GameModdingTool:
+    DRAIN_INTERVAL_MS = 50  # how often queued log/progress events reach the UI
+    ROW_BATCH_SIZE = 500  # file_tree rows inserted per UI tick
+    PREFETCH_DISTANCE = 2  # image rows decoded ahead on each side of the selection
+    SORT_KEYS = {
+        '#0': lambda name, info: name,
+        'Size': lambda name, info: info['size'],
+        'Type': lambda name, info: info['file_type'],
+        'Status': lambda name, info: info['status'],
+        # Header metadata; entries without it sort first
+        'Dimensions': lambda name, info: info.get('meta', {}).get('width', 0) * info.get('meta', {}).get('height', 0),
+        'Duration': lambda name, info: info.get('meta', {}).get('duration') or 0.0,
+        'Details': lambda name, info: format_details(info.get('meta', {})),
+    }
+
     def __init__(self, root):
+        self.startup = StartupTimer(_LAUNCHED)
+        self.startup.record("imports + Tk root", 0.0)
+        ui_start = self.startup.now()
         self.root = root
         self.root.title("CannonLoader V0.0.1 - Audio / Texture pack loader")
         self.root.geometry("1200x800")
-        icon_path = "icon.jpg"
-        icon_load = Image.open(icon_path)
-        icon_render = ImageTk.PhotoImage(icon_load)
-        root.iconphoto(False, icon_render)
-        root.iconbitmap("icon.ico") 
-
-        # Initialize pygame mixer for audio playback (deferred init allowed)
-        try:
-            pygame.mixer.init()
-            self.audio_enabled = True
-        except Exception:
-            self.audio_enabled = False
 
-        # Check for pydub + ffmpeg availability for audio conversion
-        try:
-            AudioSegment.silent(duration=1)
-            self.audio_conversion_enabled = True
-        except Exception:
-            self.audio_conversion_enabled = False
+        # pygame, pydub and the icon load after the window is painted;
+        # the flags flip once _probe_capabilities finishes.
+        self.audio_enabled = False
+        self.audio_conversion_enabled = False
+        self.capabilities_ready = threading.Event()
+        self._painted = False
 
         # Data storage
         self.current_file = None
-        self.extracted_files: Dict[str, dict] = {}  # filename -> { offset, size, data, original_data, file_path?, file_type }
-        self.file_type = None  # 'webp' for tx.pk (images) or 'ogg' for audio pk
+        self.workspace = Workspace()  # open archives backing the in-memory entries
+        self.workspace_paths: List[str] = []  # the selected .pk, or every archive of a media folder
+        self.workspace_namespaced = False  # entry names carry an 'sx/'-style archive prefix
+        self.extracted_files: Dict[str, dict] = {}  # filename -> { offset, size, data, original_data, file_path?, file_type, status }
+        self.file_type = None  # detected from content: 'webp', 'ogg', 'mixed' or 'unknown'
         self.extraction_output_path = None
-        self.current_audio_tempfile = None  # path to temp file used for playback
+        self.current_audio = None  # entry name selected for playback
+        self.current_channel = None  # pygame Channel of the clip playing
+        self.sounds = SoundCache()  # decoded PCM of recently played clips
         self.current_image_tk = None  # keep reference to PhotoImage
+        self.thumbnails = ThumbnailCache()  # decoded previews, filled off the Tk thread
         self.playback_lock = threading.Lock()
+        self.events = EventChannel()  # background threads log/report through this
+        self.progress_meter = ProgressMeter()
+        self._draining = False
+        self.sort_column = None  # file_tree column the entry table is sorted by
+        self.sort_reverse = False
+        self._populate_generation = 0  # bumped to cancel a batched tree fill
+        self.bulk_converter = None  # BulkConverter while a bulk replace runs
+        self.conversion_cache = ConversionCache()  # encoded outputs reused across sessions
+        self.dedup = DedupIndex()  # entries grouped by identical content, across archives
+        self.history = EditHistory()  # undo/redo of replacements, bytes held once per content hash
 
         # New option: store extracted in memory
         self.store_in_memory_var = tk.BooleanVar(value=True)
 
         self.setup_ui()
+        self.startup.record("build UI", ui_start)
         atexit.register(self._cleanup_on_exit)
+        self.root.after(self.DRAIN_INTERVAL_MS, self._drain_events)
+        self.root.bind('<Map>', self._on_map, add='+')
+
+    # ---------- deferred startup ----------
+    def _on_map(self, event):
+        if event.widget is self.root and not self._painted:
+            self._painted = True
+            # Idle callbacks queued before this one draw the window
+            self.root.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self):
+        self.startup.record("window shown", 0.0)
+        with self.startup.phase("icon"):
+            try:
+                from PIL import Image, ImageTk
+                icon_render = ImageTk.PhotoImage(Image.open("icon.jpg"))
+                self.root.iconphoto(False, icon_render)
+                self.root.iconbitmap("icon.ico")
+            except Exception as e:
+                self.log_message(f"Could not load window icon: {e}")
+        threading.Thread(target=self._probe_capabilities, daemon=True).start()
+
+    def _probe_capabilities(self):
+        """Import and initialise the audio subsystems off the UI thread."""
+        with self.startup.phase("pygame mixer (background)"):
+            try:
+                import pygame
+                pygame.mixer.init()
+                self.audio_enabled = True
+            except Exception:
+                self.audio_enabled = False
+        # Check for pydub + ffmpeg availability for audio conversion
+        with self.startup.phase("pydub probe (background)"):
+            try:
+                from pydub import AudioSegment
+                AudioSegment.silent(duration=1)
+                self.audio_conversion_enabled = True
+            except Exception:
+                self.audio_conversion_enabled = False
+        self.capabilities_ready.set()
+        self.events.call(self._capabilities_ready)
+
+    def _capabilities_ready(self):
+        if not self.audio_enabled:
+            self.log_message("Audio playback not available (pygame mixer failed)")
+        if not self.audio_conversion_enabled:
+            self.log_message("Audio conversion not available (install pydub and ffmpeg)")
+        report = self.startup.report()
+        self.log_message(report)
+        if os.environ.get("CANNONLOADER_STARTUP_REPORT"):
+            print(report, file=sys.stderr)
+
+    def _wait_for_capabilities(self):
+        """Block until the background probe has set the capability flags (normally long done).
+
+        UI thread only, as it sets the cursor; worker threads wait on capabilities_ready directly.
+        """
+        if not self.capabilities_ready.is_set():
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            self.capabilities_ready.wait(10)
+            self.root.config(cursor="")
 
     def setup_ui(self):
         # Main frame with paned window for resizable sections
@@ -76,6 +174,7 @@ class GameModdingTool:
         ttk.Button(file_frame, text="Select .pk File", command=self.select_file).grid(row=0, column=0, padx=(0, 10))
         self.file_path_var = tk.StringVar(value="No file selected")
         ttk.Label(file_frame, textvariable=self.file_path_var).grid(row=0, column=1, sticky=(tk.W, tk.E))
+        ttk.Button(file_frame, text="Open Media Folder (sm/sx/tx)", command=self.select_folder).grid(row=1, column=0, padx=(0, 10), pady=(5, 0))
 
         # Extraction section
         extract_frame = ttk.LabelFrame(left_frame, text="Extraction", padding="5")
@@ -87,30 +186,56 @@ class GameModdingTool:
         self.extract_button.grid(row=0, column=1, padx=(0, 10))
         self.store_mem_check = ttk.Checkbutton(extract_frame, text="Store extracted in memory", variable=self.store_in_memory_var)
         self.store_mem_check.grid(row=0, column=2, padx=(10, 0))
+        self.rebuild_index_button = ttk.Button(extract_frame, text="Rebuild Index", command=self.rebuild_index, state="disabled")
+        self.rebuild_index_button.grid(row=0, column=3, padx=(10, 0))
+        self.verify_button = ttk.Button(extract_frame, text="Verify", command=self.verify_archives, state="disabled")
+        self.verify_button.grid(row=0, column=4, padx=(10, 0))
 
         self.output_path_var = tk.StringVar(value="No output folder selected")
-        ttk.Label(extract_frame, textvariable=self.output_path_var).grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(6,0))
+        ttk.Label(extract_frame, textvariable=self.output_path_var).grid(row=1, column=0, columnspan=5, sticky=(tk.W, tk.E), pady=(6,0))
 
         # File list section
         list_frame = ttk.LabelFrame(left_frame, text="Extracted Files", padding="5")
         list_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         list_frame.columnconfigure(0, weight=1)
-        list_frame.rowconfigure(0, weight=1)
-
-        self.file_tree = ttk.Treeview(list_frame, columns=('Size', 'Type', 'Status'), show='tree headings')
-        self.file_tree.heading('#0', text='Filename')
+        list_frame.rowconfigure(1, weight=1)
+
+        # Filters run against extracted_files, not the widget
+        filter_frame = ttk.Frame(list_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        filter_frame.columnconfigure(1, weight=1)
+        ttk.Label(filter_frame, text="Filter:").grid(row=0, column=0, padx=(0, 5))
+        self.filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.filter_var).grid(row=0, column=1, sticky=(tk.W, tk.E))
+        self.type_filter_var = tk.StringVar(value="All")
+        ttk.Combobox(filter_frame, textvariable=self.type_filter_var, values=("All", "Image", "Audio", "Unknown"), state="readonly", width=8).grid(row=0, column=2, padx=(5, 0))
+        self.status_filter_var = tk.StringVar(value="All")
+        ttk.Combobox(filter_frame, textvariable=self.status_filter_var, values=("All", "In-memory", "Extracted", "Modified", "Corrupt"), state="readonly", width=10).grid(row=0, column=3, padx=(5, 0))
+        self.list_count_var = tk.StringVar(value="")
+        ttk.Label(filter_frame, textvariable=self.list_count_var).grid(row=0, column=4, padx=(10, 0))
+        for var in (self.filter_var, self.type_filter_var, self.status_filter_var):
+            var.trace_add('write', lambda *_: self._refresh_file_tree())
+
+        self.file_tree = ttk.Treeview(list_frame, columns=('Size', 'Type', 'Dimensions', 'Duration', 'Details', 'Status'), show='tree headings')
+        self.file_tree.heading('#0', text='Filename', command=lambda: self.sort_entries('#0'))
         self.file_tree.column('#0', width=260)
-        self.file_tree.heading('Size', text='Size (bytes)')
+        self.file_tree.heading('Size', text='Size (bytes)', command=lambda: self.sort_entries('Size'))
         self.file_tree.column('Size', width=100, anchor='center')
-        self.file_tree.heading('Type', text='Type')
+        self.file_tree.heading('Type', text='Type', command=lambda: self.sort_entries('Type'))
         self.file_tree.column('Type', width=80, anchor='center')
-        self.file_tree.heading('Status', text='Status')
+        self.file_tree.heading('Dimensions', text='Dimensions', command=lambda: self.sort_entries('Dimensions'))
+        self.file_tree.column('Dimensions', width=90, anchor='center')
+        self.file_tree.heading('Duration', text='Duration', command=lambda: self.sort_entries('Duration'))
+        self.file_tree.column('Duration', width=70, anchor='center')
+        self.file_tree.heading('Details', text='Details', command=lambda: self.sort_entries('Details'))
+        self.file_tree.column('Details', width=150, anchor='center')
+        self.file_tree.heading('Status', text='Status', command=lambda: self.sort_entries('Status'))
         self.file_tree.column('Status', width=120, anchor='center')
-        self.file_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.file_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
         self.file_tree.bind('<<TreeviewSelect>>', self.on_file_select)
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.file_tree.yview)
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
         self.file_tree.configure(yscrollcommand=scrollbar.set)
 
         # Replacement
@@ -122,11 +247,36 @@ class GameModdingTool:
         self.replace_button.grid(row=0, column=0, padx=(0, 10))
 
         self.auto_convert_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(replace_frame, text="Auto-convert formats", variable=self.auto_convert_var).grid(row=0, column=1, padx=(0, 10))
+        ttk.Checkbutton(replace_frame, text="Auto-convert formats", variable=self.auto_convert_var,
+                        command=self._update_fit_state).grid(row=0, column=1, padx=(0, 10))
 
         self.save_modified_button = ttk.Button(replace_frame, text="Save Modified .pk File", command=self.save_modified_file, state="disabled")
         self.save_modified_button.grid(row=0, column=2)
 
+        self.bulk_replace_button = ttk.Button(replace_frame, text="Bulk Replace from Folder", command=self.bulk_replace, state="disabled")
+        self.bulk_replace_button.grid(row=1, column=0, padx=(0, 10), pady=(5, 0))
+        self.cancel_bulk_button = ttk.Button(replace_frame, text="Cancel Bulk Replace", command=self.cancel_bulk_replace, state="disabled")
+        self.cancel_bulk_button.grid(row=1, column=1, padx=(0, 10), pady=(5, 0))
+        self.fit_to_slot_var = tk.BooleanVar(value=False)
+        # Fitting re-encodes the source, so it only applies while auto-convert is on
+        self.fit_to_slot_check = ttk.Checkbutton(replace_frame, text="Fit to original size", variable=self.fit_to_slot_var)
+        self.fit_to_slot_check.grid(row=1, column=2, sticky=tk.W, pady=(5, 0))
+        self.export_patch_button = ttk.Button(replace_frame, text="Export Mod Patch", command=self.export_patch, state="disabled")
+        self.export_patch_button.grid(row=2, column=0, padx=(0, 10), pady=(5, 0))
+        ttk.Button(replace_frame, text="Apply Mod Patch", command=self.apply_patch_file).grid(row=2, column=1, padx=(0, 10), pady=(5, 0))
+        self.dirty_var = tk.StringVar(value="")
+        ttk.Label(replace_frame, textvariable=self.dirty_var).grid(row=2, column=2, sticky=tk.W, pady=(5, 0))
+        self.replace_copies_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(replace_frame, text="Replace identical copies too", variable=self.replace_copies_var).grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        history_frame = ttk.Frame(replace_frame)
+        history_frame.grid(row=3, column=2, sticky=tk.W, pady=(5, 0))
+        self.undo_button = ttk.Button(history_frame, text="Undo", command=self.undo, state="disabled")
+        self.undo_button.grid(row=0, column=0, padx=(0, 5))
+        self.redo_button = ttk.Button(history_frame, text="Redo", command=self.redo, state="disabled")
+        self.redo_button.grid(row=0, column=1)
+        for sequence, handler in (('<Control-z>', self.undo), ('<Control-y>', self.redo), ('<Control-Shift-Z>', self.redo)):
+            self.root.bind(sequence, lambda event, handler=handler: self._history_shortcut(event, handler))
+
         # Log
         log_frame = ttk.LabelFrame(left_frame, text="Log", padding="5")
         log_frame.grid(row=4, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -135,6 +285,11 @@ class GameModdingTool:
         self.log_text = scrolledtext.ScrolledText(log_frame, height=8, width=50)
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
+        self.progress_bar = ttk.Progressbar(log_frame, orient=tk.HORIZONTAL, mode='determinate', maximum=100)
+        self.progress_bar.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.progress_var = tk.StringVar(value="Idle")
+        ttk.Label(log_frame, textvariable=self.progress_var).grid(row=2, column=0, sticky=tk.W)
+
         left_frame.rowconfigure(2, weight=1)
         left_frame.rowconfigure(4, weight=1)
 
@@ -155,12 +310,13 @@ class GameModdingTool:
         self.audio_controls.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
 
         ttk.Button(self.audio_controls, text="▶ Play", command=self.play_audio).grid(row=0, column=0, padx=(0, 5))
-        ttk.Button(self.audio_controls, text="⏹ Stop", command=self.stop_audio).grid(row=0, column=1, padx=(0, 5))
+        ttk.Button(self.audio_controls, text="▶ Original", command=lambda: self.play_audio('original')).grid(row=0, column=1, padx=(0, 5))
+        ttk.Button(self.audio_controls, text="⏹ Stop", command=self.stop_audio).grid(row=0, column=2, padx=(0, 5))
 
         self.volume_var = tk.DoubleVar(value=0.7)
-        ttk.Label(self.audio_controls, text="Volume:").grid(row=0, column=2, padx=(10, 5))
+        ttk.Label(self.audio_controls, text="Volume:").grid(row=0, column=3, padx=(10, 5))
         volume_scale = ttk.Scale(self.audio_controls, from_=0.0, to=1.0, variable=self.volume_var, command=self.on_volume_change, length=100)
-        volume_scale.grid(row=0, column=3, padx=(0, 5))
+        volume_scale.grid(row=0, column=4, padx=(0, 5))
         self.audio_controls.grid_remove()
 
         self.preview_frame = ttk.Frame(parent, relief=tk.SUNKEN, borderwidth=2)
@@ -185,27 +341,120 @@ class GameModdingTool:
         ttk.Button(conversion_info_frame, text="Clear Preview", command=self.clear_preview).grid(row=0, column=1, padx=(10, 0))
 
     def log_message(self, message: str):
-        self.log_text.insert(tk.END, message + "\n")
+        # Safe from any thread; lines reach the widget in batches via _drain_events
+        self.events.log(message)
+
+    def _append_log(self, lines: List[str]):
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
+
+    def _drain_events(self):
+        """Apply queued background events on the Tk thread, then re-arm the timer."""
+        if self._draining:
+            # Re-entered from a modal dialog opened by a 'call' event
+            return
+        self._draining = True
+        try:
+            events = self.events.drain()
+            if events:
+                with span("drain_events", "ui", events=len(events)):
+                    self._apply_events(events)
+        finally:
+            self._draining = False
+            self.root.after(self.DRAIN_INTERVAL_MS, self._drain_events)
+
+    def _apply_events(self, events: list):
+        lines = []
+        progressed = False
+        for event in events:
+            if event.kind == 'log':
+                lines.append(event.payload[0])
+                continue
+            if lines:
+                self._append_log(lines)
+                lines = []
+            if event.kind == 'call':
+                fn, args = event.payload
+                try:
+                    fn(*args)
+                except Exception as e:
+                    lines.append(f"UI update error: {e}")
+            else:
+                self.progress_meter.update(event)
+                progressed = True
+        if lines:
+            self._append_log(lines)
+        if progressed:
+            self.progress_bar['value'] = self.progress_meter.fraction * 100
+            self.progress_var.set(self.progress_meter.text())
 
     def select_file(self):
         file_path = filedialog.askopenfilename(title="Select .pk file", filetypes=[("PK files", "*.pk"), ("All files", "*.*")])
         if file_path:
             self.current_file = file_path
+            self.workspace_paths = [file_path]
+            self.workspace_namespaced = False
             self.file_path_var.set(os.path.basename(file_path))
             self.extract_button.config(state="normal")
+            self.rebuild_index_button.config(state="normal")
+            self.verify_button.config(state="normal")
             self.log_message(f"Selected file: {file_path}")
 
-            if file_path.lower().endswith('tx.pk'):
-                self.file_type = "webp"
-                self.log_message("Detected WebP image file (tx.pk)")
-            elif file_path.lower().endswith('.pk'):
-                self.file_type = "ogg"
-                self.log_message("Detected OGG audio file (.pk)")
-            else:
-                self.file_type = "unknown"
-                self.log_message("Unknown file type - will attempt OGG extraction")
+            # Classify by everything the archive contains, not by name or its first
+            # asset. The scan runs off the UI thread and leaves a sidecar index
+            # that the extraction reuses.
+            self.file_type = None
+
+            def classify_worker():
+                try:
+                    kind = self._classify_archive(file_path)
+                except Exception as e:
+                    self.log_message(f"Could not read file: {e}")
+                    kind = "unknown"
+                self.events.call(self._archive_classified, file_path, kind)
+
+            threading.Thread(target=classify_worker, daemon=True).start()
+
+    @staticmethod
+    def _classify_archive(pk_path: str) -> str:
+        """'webp', 'ogg', 'mixed' or 'unknown' from a full scan (or the current sidecar index)."""
+        return classify(FILE_TYPE_KINDS[entry[2]] for entry in scan_file(pk_path))
+
+    def _archive_classified(self, pk_path: str, kind: str):
+        if pk_path != self.current_file or self.file_type is not None:
+            return  # another archive was selected, or extraction already classified this one
+        self.file_type = kind
+        if kind == "webp":
+            self.log_message("Detected WebP image archive")
+        elif kind == "ogg":
+            self.log_message("Detected OGG audio archive")
+        elif kind == "mixed":
+            self.log_message("Detected mixed WebP and OGG archive")
+        else:
+            self.log_message("No known assets detected - will scan for all formats")
+
+    def select_folder(self):
+        """Open every Redcon archive in a media folder as one namespaced workspace."""
+        directory = filedialog.askdirectory(title="Select the folder holding sm.pk, sx.pk and tx.pk")
+        if not directory:
+            return
+        try:
+            paths = find_archives(directory)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not read folder: {e}")
+            return
+        if not paths:
+            messagebox.showwarning("No Archives", "No sm.pk, sx.pk or tx.pk found in that folder.")
+            return
+        self.current_file = paths[0]
+        self.workspace_paths = paths
+        self.workspace_namespaced = True
+        self.file_path_var.set(", ".join(os.path.basename(path) for path in paths))
+        self.store_in_memory_var.set(True)  # on-disk extraction handles one archive at a time
+        self.extract_button.config(state="normal")
+        self.rebuild_index_button.config(state="normal")
+        self.verify_button.config(state="normal")
+        self.log_message(f"Selected workspace: {', '.join(paths)}")
 
     def select_output_folder(self):
         output_path = filedialog.askdirectory(title="Select output folder for extracted files")
@@ -221,8 +470,10 @@ class GameModdingTool:
         if not self.extraction_output_path or not os.path.exists(self.extraction_output_path):
             return
         self.extracted_files.clear()
-        for item in self.file_tree.get_children():
-            self.file_tree.delete(item)
+        self._close_workspace()
+        self.thumbnails.clear()
+        self.sounds.clear()
+        self._clear_history()
         try:
             for filename in os.listdir(self.extraction_output_path):
                 file_path = os.path.join(self.extraction_output_path, filename)
@@ -241,156 +492,276 @@ class GameModdingTool:
                         'offset': -1,
                         'size': file_size,
                         'data': file_data,
-                        'original_data': bytes(file_data),
+                        'original_data': file_data,
                         'file_path': file_path,
-                        'file_type': file_type
+                        'file_type': file_type,
+                        'meta': asset_metadata(file_data, 0, file_size, file_type),
+                        'status': "Extracted",
                     }
-                    self.file_tree.insert('', 'end', text=filename, values=(file_size, file_type, "Extracted"))
-                    self.log_message(f"Loaded: {filename} ({file_size} bytes)")
+            self._refresh_file_tree()
             if self.extracted_files:
                 self.replace_button.config(state="normal")
+                self.bulk_replace_button.config(state="normal")
                 self.log_message(f"Loaded {len(self.extracted_files)} extracted files from output directory")
         except Exception as e:
             self.log_message(f"Error loading extracted files: {str(e)}")
 
+    # ---------- entry table / file list ----------
+    def _visible_entries(self) -> List[str]:
+        """Names in extracted_files passing the filters, in the current sort order."""
+        text = self.filter_var.get().strip().lower()
+        file_type = self.type_filter_var.get()
+        status = self.status_filter_var.get()
+        names = [name for name, info in self.extracted_files.items()
+                 if (not text or text in name.lower())
+                 and (file_type == "All" or info['file_type'] == file_type)
+                 and (status == "All" or info['status'] == status)]
+        if self.sort_column is not None:
+            key = self.SORT_KEYS[self.sort_column]
+            names.sort(key=lambda name: key(name, self.extracted_files[name]), reverse=self.sort_reverse)
+        return names
+
+    def sort_entries(self, column: str):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        self._refresh_file_tree()
+
+    @staticmethod
+    def _row_values(info: dict) -> tuple:
+        meta = info.get('meta', {})
+        return (info['size'], info['file_type'], format_dimensions(meta), format_duration(meta), format_details(meta), info['status'])
+
+    @traced("refresh_file_tree", "ui")
+    def _refresh_file_tree(self):
+        """Rebuild file_tree from the entry table, inserting rows in batches."""
+        self._populate_generation += 1
+        self.file_tree.delete(*self.file_tree.get_children())
+        names = self._visible_entries()
+        self.list_count_var.set(f"{len(names)} of {len(self.extracted_files)}")
+        self._insert_rows(names, 0, self._populate_generation)
+
+    @traced("insert_rows", "ui")
+    def _insert_rows(self, names: List[str], start: int, generation: int):
+        if generation != self._populate_generation:
+            return  # superseded by a newer refresh
+        for name in names[start:start + self.ROW_BATCH_SIZE]:
+            info = self.extracted_files.get(name)
+            if info is not None:
+                self.file_tree.insert('', 'end', iid=name, text=name, values=self._row_values(info))
+        if start + self.ROW_BATCH_SIZE < len(names):
+            self.root.after(1, self._insert_rows, names, start + self.ROW_BATCH_SIZE, generation)
+
+    def _update_row(self, name: str):
+        if self.file_tree.exists(name):
+            self.file_tree.item(name, values=self._row_values(self.extracted_files[name]))
+
     # ---------- NEW: in-memory extraction helpers ----------
+    def _open_workspace(self) -> Workspace:
+        self._close_workspace()
+        self.thumbnails.clear()
+        self.sounds.clear()
+        self.workspace = Workspace(self.workspace_paths, self.workspace_namespaced)
+        return self.workspace
+
+    def _close_workspace(self):
+        self.workspace.close()
+        self.workspace = Workspace()
+
+    def _archive_entries(self, namespace: str) -> List[Tuple[str, dict]]:
+        return [(name, info) for name, info in self.extracted_files.items() if info.get('archive', '') == namespace]
+
+    def _dirty_archives(self) -> List[str]:
+        """Namespaces of the archives with unsaved replacements."""
+        return sorted({info.get('archive', '') for info in self.extracted_files.values() if self._is_modified(info)})
+
+    def _archive_label(self, namespace: str) -> str:
+        if namespace in self.workspace.archives:
+            return os.path.basename(self.workspace.path(namespace))
+        return os.path.basename(self.current_file or "")
+
+    def _update_dirty_label(self):
+        dirty = self._dirty_archives()
+        self.dirty_var.set(f"Unsaved: {', '.join(self._archive_label(ns) for ns in dirty)}" if dirty else "")
+
+    @staticmethod
+    def _is_modified(file_info: dict) -> bool:
+        # Untouched entries share one view for 'data' and 'original_data'
+        data = file_info['data']
+        original = file_info['original_data']
+        return data is not original and data != original
+
     def _find_webp_entries(self, data: bytes) -> List[Tuple[int, int]]:
         """Return list of (offset, size) for WebP RIFF blocks"""
-        results = []
-        offset = 0
-        length = len(data)
-        while True:
-            idx = data.find(b'RIFF', offset)
-            if idx == -1:
-                break
-            # check for "WEBP" at idx+8
-            if idx + 12 <= length and data[idx+8:idx+12] == b'WEBP':
-                try:
-                    chunk_size = struct.unpack_from('<I', data, idx+4)[0]
-                    full_size = chunk_size + 8
-                except Exception:
-                    full_size = length - idx
-                if idx + full_size > length:
-                    full_size = length - idx
-                results.append((idx, full_size))
-                offset = idx + full_size
-            else:
-                offset = idx + 4
-        return results
+        return [(rec.offset, rec.size) for rec in iter_webp_entries(data)]
 
     def _find_ogg_entries(self, data: bytes) -> List[Tuple[int, int]]:
         """Return list of (offset, size) for complete Ogg streams by parsing pages."""
-        results = []
-        ogg_signature = b"OggS"
-        cursor = 0
-        length = len(data)
-
-        while cursor < length:
-            start = data.find(ogg_signature, cursor)
-            if start == -1:
-                break
-
-            pos = start
-            while pos < length:
-            # Minimum Ogg page header size
-                if pos + 27 > length:
-                   break
-
-                header_type_flag = data[pos + 5]
-                segment_count = data[pos + 26]
-
-            # Segment table
-                seg_table_end = pos + 27 + segment_count
-                if seg_table_end > length:
-                    break
-
-                segment_sizes = data[pos + 27:seg_table_end]
-                page_data_size = sum(segment_sizes)
-                page_full_size = 27 + segment_count + page_data_size
-
-                end = pos + page_full_size
-                if end > length:
-                    break
-
-                pos = end
-
-            # End-of-stream page (0x04 flag)
-                if header_type_flag & 0x04:
-                    break
-
-                # Must start next page with "OggS"
-                if data.find(ogg_signature, pos) != pos:
-                    break
-
-            # Record complete file if we parsed at least one page
-            if pos > start:
-                results.append((start, pos - start))
-                cursor = pos
-            else:
-                cursor = start + 4  # avoid infinite loop if bad data
-
-        return results
-
+        return [(rec.offset, rec.size) for rec in iter_ogg_entries(data)]
 
     def extract_files_in_memory(self):
-        """Extract assets by scanning the .pk and store them in memory with offsets."""
-        if not self.current_file:
+        """Extract assets by scanning the .pk and store them in memory with offsets.
+
+        The scan runs on a worker thread; entries are populated on the UI thread.
+        """
+        if not self.workspace_paths:
             messagebox.showwarning("Missing PK", "Please select a .pk file first.")
             return
         try:
-            with open(self.current_file, 'rb') as f:
-                pk_data = f.read()
-            entries = []
-            if self.file_type == 'webp':
-                webps = self._find_webp_entries(pk_data)
-                for off, sz in webps:
-                    entries.append((off, sz, 'Image'))
-            elif self.file_type == 'ogg':
-                oggs = self._find_ogg_entries(pk_data)
-                for off, sz in oggs:
-                    entries.append((off, sz, 'Audio'))
-            else:
-                # if unknown, try both and merge (sorted)
-                webps = [(o, s, 'Image') for o, s in self._find_webp_entries(pk_data)]
-                oggs = [(o, s, 'Audio') for o, s in self._find_ogg_entries(pk_data)]
-                entries = sorted(webps + oggs, key=lambda x: x[0])
-
-            # Deduplicate / avoid overlaps (simple scan)
-            cleaned = []
-            last_end = -1
-            for off, sz, ftype in entries:
-                if off <= last_end:
-                    continue
-                cleaned.append((off, sz, ftype))
-                last_end = off + sz - 1
-
-            # Populate extracted_files
+            # Entries are zero-copy views into the mapped archives; only
+            # replaced entries get their own buffer.
             self.extracted_files.clear()
-            for i, (off, sz, ftype) in enumerate(cleaned):
-                ext = '.webp' if ftype == 'Image' else '.ogg'
-                filename = f"{ftype.lower()}_{i:04d}{ext}"
-                data = pk_data[off: off + sz]
+            workspace = self._open_workspace()
+        except Exception as e:
+            self.log_message(f"Error extracting in memory: {e}")
+            messagebox.showerror("Extraction Error", f"Could not extract in memory: {e}")
+            return
+        self.extract_button.config(state="disabled")
+        paths = workspace.paths
+
+        def scan_worker():
+            try:
+                # Archives with a current sidecar index skip the scan; the rest
+                # are scanned side by side on separate processes.
+                done = [0, 0]  # entries, bytes of finished archives
+                self.events.start("Scan", total_bytes=sum(len(archive) for archive in workspace.archives.values()))
+
+                def on_progress(path, entries, nbytes):
+                    self.events.progress("Scan", done[0] + entries, done[1] + nbytes)
+
+                def on_done(path, indexed, error):
+                    if error is not None:
+                        self.log_message(f"✗ Could not scan {os.path.basename(path)}: {error}")
+                        return
+                    done[0] += len(indexed)
+                    done[1] += os.path.getsize(path)
+                    self.log_message(f"{os.path.basename(path)}: {len(indexed)} entries")
+                    self.events.progress("Scan", done[0], done[1])
+
+                results = scan_files(paths, on_done=on_done, on_progress=on_progress)
+                self.events.finish("Scan")
+                self.events.call(self._populate_entries, workspace, results)
+            except Exception as e:
+                self.events.call(self._extraction_failed, str(e))
+
+        threading.Thread(target=scan_worker, daemon=True).start()
+
+    @traced("populate_entries", "ui")
+    def _populate_entries(self, workspace: Workspace, results: dict):
+        self.extract_button.config(state="normal")
+        if workspace is not self.workspace:
+            return  # another archive was opened while this one was scanning
+        self.file_type = classify(FILE_TYPE_KINDS[entry[2]] for indexed in results.values() for entry in indexed)
+        self.log_message(f"Archive content type: {self.file_type}")
+
+        # Populate extracted_files, one namespace per archive. Identical
+        # entries share the first copy's view, so only its pages get read.
+        self.dedup = DedupIndex()
+        self._clear_history()  # edits referred to the previous entries
+        shared = {}  # (hash, size) -> view
+        for namespace, archive in workspace.archives.items():
+            for i, (off, sz, ftype, digest, meta) in enumerate(results.get(archive.path, ())):
+                filename = workspace.entry_key(namespace, entry_name(i, ftype))
+                data = shared.setdefault((digest, sz), archive.view(off, sz))
+                self.dedup.add(filename, digest, sz)
                 self.extracted_files[filename] = {
                     'offset': off,
                     'size': sz,
                     'data': data,
-                    'original_data': bytes(data),
+                    'original_data': data,
                     'file_type': ftype,
+                    'hash': digest,
+                    'content': digest,  # hash of 'data'; previews are cached by it
+                    'meta': meta,
+                    'status': "In-memory",
+                    'archive': namespace,
                     # no file_path since it's in-memory
                 }
-            # Update treeview
-            for item in self.file_tree.get_children():
-                self.file_tree.delete(item)
-            for name, info in self.extracted_files.items():
-                self.file_tree.insert('', 'end', text=name, values=(info['size'], info['file_type'], "In-memory"))
+        self._refresh_file_tree()
+        self._update_dirty_label()
+        self.log_message(self.dedup.summary())
 
-            if self.extracted_files:
-                self.replace_button.config(state="normal")
-                self.save_modified_button.config(state="normal")
-            self.log_message(f"In-memory extraction complete: {len(self.extracted_files)} assets found")
-        except Exception as e:
-            self.log_message(f"Error extracting in memory: {e}")
-            messagebox.showerror("Extraction Error", f"Could not extract in memory: {e}")
+        if self.extracted_files:
+            self.replace_button.config(state="normal")
+            self.bulk_replace_button.config(state="normal")
+            self.save_modified_button.config(state="normal")
+        self.log_message(f"In-memory extraction complete: {len(self.extracted_files)} assets found")
+
+    def _extraction_failed(self, error: str):
+        self.extract_button.config(state="normal")
+        self.log_message(f"Error extracting in memory: {error}")
+        messagebox.showerror("Extraction Error", f"Could not extract in memory: {error}")
+
+    def rebuild_index(self):
+        """Drop the sidecar scan indexes and rescan the selected archives."""
+        if not self.workspace_paths:
+            return
+        if sum(invalidate_index(path) for path in self.workspace_paths):
+            self.log_message("Scan index invalidated")
+        if self.store_in_memory_var.get():
+            self.extract_files_in_memory()
+
+    def verify_archives(self):
+        """Check Ogg page CRCs, RIFF sizes and overlaps in every selected archive, off the Tk thread."""
+        if not self.workspace_paths:
+            return
+        paths = list(self.workspace_paths)
+        self.verify_button.config(state="disabled")
+
+        def verify_worker():
+            try:
+                results = {}  # path -> (entries checked, issues)
+                done = 0
+                self.events.start("Verify", total_items=len(paths), total_bytes=sum(os.path.getsize(path) for path in paths))
+                for i, path in enumerate(paths, 1):
+                    records, issues = verify_file(path)
+                    results[path] = (len(records), issues)
+                    done += os.path.getsize(path)
+                    self.events.progress("Verify", i, done)
+                self.events.finish("Verify")
+                self.events.call(self._verify_done, results)
+            except Exception as e:
+                self.events.call(self._verify_failed, str(e))
+
+        threading.Thread(target=verify_worker, daemon=True).start()
+
+    def _verify_done(self, results: dict):
+        self.verify_button.config(state="normal")
+        # Flag loaded entries by (archive, offset); issues elsewhere are only logged
+        by_offset = {}
+        for name, info in self.extracted_files.items():
+            if info.get('issues'):
+                del info['issues']
+                if info['status'] == "Corrupt":
+                    info['status'] = "In-memory"
+                    self._update_row(name)
+            if 'archive' in info:
+                by_offset[(info['archive'], info['offset'])] = name
+
+        total = 0
+        for path, (checked, issues) in results.items():
+            namespace = self.workspace.namespace_of(path) if self.workspace_namespaced else ''
+            self.log_message(f"{os.path.basename(path)}: {checked} entries checked, {len(issues)} problems")
+            for issue in issues:
+                name = by_offset.get((namespace, issue.offset))
+                self.log_message(f"✗ {os.path.basename(path)} {name or ''} {describe(issue)}")
+                if name is not None:
+                    info = self.extracted_files[name]
+                    info.setdefault('issues', []).append(issue.problem)
+                    if info['status'] != "Modified":
+                        info['status'] = "Corrupt"
+                    self._update_row(name)
+            total += len(issues)
+        if total:
+            messagebox.showwarning("Verify", f"{total} problems found; see the log. Affected entries are marked Corrupt.")
+        else:
+            messagebox.showinfo("Verify", "No problems found: every Ogg page CRC and RIFF size checks out.")
+
+    def _verify_failed(self, error: str):
+        self.verify_button.config(state="normal")
+        self.log_message(f"✗ Verify failed: {error}")
+        messagebox.showerror("Verify", f"Could not verify: {error}")
 
     # ---------- end new helpers ----------
 
@@ -399,7 +770,7 @@ class GameModdingTool:
         if not self.current_file:
             messagebox.showwarning("Missing Selection", "Please select a .pk file first.")
             return
-        if self.store_in_memory_var.get():
+        if self.store_in_memory_var.get() or self.workspace_namespaced:
             self.log_message("Extracting files into memory (no disk write)...")
             self.extract_files_in_memory()
             return
@@ -412,11 +783,14 @@ class GameModdingTool:
             self.log_message(f"Starting extraction of: {self.current_file}")
             self.log_message(f"Output directory: {self.extraction_output_path}")
 
-            if self.file_type == "webp":
+            if self.file_type is None:
+                self.file_type = self._classify_archive(self.current_file)
+            # A mixed or unrecognised archive gets both extractors, as in memory mode
+            if self.file_type != "ogg":
                 self.log_message("Extracting WebP images using redcon_webp_extractor...")
                 webpex.extract_webp_images(self.current_file, self.extraction_output_path)
                 self.log_message("WebP extraction completed!")
-            elif self.file_type == "ogg":
+            if self.file_type != "webp":
                 self.log_message("Extracting OGG audio files using redcon_ogg_extractor...")
                 oggex.extract_ogg_files(self.current_file, self.extraction_output_path)
                 self.log_message("OGG extraction completed!")
@@ -454,95 +828,351 @@ class GameModdingTool:
         if not new_file_path:
             return
 
-        converted_path = None
-        try:
-            should_convert = self.auto_convert_var.get()
-            original_file_type = self.extracted_files[filename]['file_type']
+        should_convert = self.auto_convert_var.get()
+        original_file_type = self.extracted_files[filename]['file_type']
+        slot = None
+        if should_convert and self.fit_to_slot_var.get():
+            slot = len(self.extracted_files[filename]['original_data'])
 
-            if should_convert:
-                converted_path = self.auto_convert_file(new_file_path, original_file_type, filename)
+        def convert_worker():
+            # Encoding (and the fit search) runs here so the window stays responsive
+            converted_path = None
+            source_path = new_file_path
+            try:
+                if should_convert:
+                    self.events.start("Convert", total_items=1)
+                    converted_path = self.auto_convert_file(new_file_path, original_file_type, filename, slot)
+                    self.events.progress("Convert", 1, os.path.getsize(new_file_path))
+                    if converted_path:
+                        source_path = converted_path
+                        self.log_message(f"Auto-converted file for compatibility")
+
+                with open(source_path, 'rb') as f:
+                    new_data = f.read()
+                self.events.call(self._finish_replace, workspace, filename, new_data, os.path.basename(source_path))
+            except Exception as e:
+                self.events.call(messagebox.showerror, "Replacement Error", f"Error replacing file: {str(e)}")
+                self.log_message(f"Replacement error: {str(e)}")
+            finally:
+                if should_convert:
+                    self.events.finish("Convert")
                 if converted_path:
-                    new_file_path = converted_path
-                    self.log_message(f"Auto-converted file for compatibility")
-
-            with open(new_file_path, 'rb') as f:
-                new_data = f.read()
-
-            # Update in-memory info
-            old_size = self.extracted_files[filename]['size']
-            self.extracted_files[filename]['data'] = new_data
-            self.extracted_files[filename]['size'] = len(new_data)
-
-            # If file exists on-disk (legacy extraction), update that too
-            if 'file_path' in self.extracted_files[filename]:
-                try:
-                    with open(self.extracted_files[filename]['file_path'], 'wb') as f:
-                        f.write(new_data)
-                except Exception:
-                    pass
+                    try:
+                        os.unlink(converted_path)
+                    except Exception:
+                        pass
+                self.events.call(lambda: self.replace_button.config(state="normal"))
 
-            self.file_tree.item(selected_item, values=(len(new_data), self.extracted_files[filename]['file_type'], "Modified"))
-            self.log_message(f"Replaced {filename} with {os.path.basename(new_file_path)}")
-            self.log_message(f"Size changed from {old_size} to {len(new_data)} bytes")
+        workspace = self.workspace  # entry names are only meaningful within it
+        self.replace_button.config(state="disabled")
+        threading.Thread(target=convert_worker, daemon=True).start()
 
-            self.save_modified_button.config(state="normal")
-            if len(new_data) != old_size:
-                messagebox.showwarning("Size Mismatch", f"Warning: New file size ({len(new_data)} bytes) differs from original ({old_size} bytes).\nThis may cause issues with the game. Consider resizing the file to match the original.")
-            # Refresh preview if the replaced file is selected
-            cursel = self.file_tree.selection()
-            if cursel and self.file_tree.item(cursel[0], 'text') == filename:
-                self.on_file_select(None)
+    def _finish_replace(self, workspace: Workspace, filename: str, new_data: bytes, source_name: str):
+        old_size = self._apply_to_copies(workspace, filename, new_data, source_name)
+        if old_size is None:
+            return
+        if len(new_data) > old_size:
+            messagebox.showwarning("Size Mismatch", f"Warning: New file size ({len(new_data)} bytes) is larger than the original ({old_size} bytes).\nIt will not be written when saving. Tick \"Fit to original size\" to re-encode it to fit.")
+        elif len(new_data) != old_size:
+            messagebox.showwarning("Size Mismatch", f"Warning: New file size ({len(new_data)} bytes) differs from original ({old_size} bytes).\nThis may cause issues with the game. Consider resizing the file to match the original.")
+
+    def _identical_copies(self, filename: str) -> List[str]:
+        return [name for name in self.dedup.copies(filename) if name in self.extracted_files]
+
+    def _apply_to_copies(self, workspace: Workspace, filename: str, new_data: bytes, source_name: str,
+                         skip=()) -> Optional[int]:
+        """_apply_replacement on filename and, if enabled, every entry with the same original content.
+
+        workspace is the one open when the replacement started; if another
+        archive has been opened since, nothing is applied and None is returned.
+        Entries in skip (replaced explicitly in the same run) are left alone.
+        All copies share the one new_data buffer. Returns filename's old size.
+        """
+        if workspace is not self.workspace or filename not in self.extracted_files:
+            self.log_message(f"✗ Dropped the replacement for {filename}: another archive was opened meanwhile")
+            return None
+        with self.history.group():
+            old_size = self._apply_replacement(filename, new_data, source_name)
+            if self.replace_copies_var.get():
+                copies = [name for name in self._identical_copies(filename) if name not in skip]
+                for name in copies:
+                    self._apply_replacement(name, new_data, source_name)
+                if copies:
+                    self.log_message(f"Also replaced {len(copies)} identical copies of {filename}")
+        self._update_history_buttons()
+        return old_size
+
+    def _apply_replacement(self, filename: str, new_data: bytes, source_name: str) -> int:
+        """Swap new_data into an entry and refresh everything derived from it; returns the old size."""
+        file_info = self.extracted_files[filename]
+        old_size = file_info['size']
+        if file_info['file_type'] == 'Audio':
+            new_data, fixed = repair_ogg_crcs(new_data)
+            if fixed:
+                self.log_message(f"Repaired {fixed} Ogg page checksums in {source_name}")
+        digest = hash_entry(new_data)
+        self.history.record(filename, file_info['data'], new_data, file_info['status'], "Modified",
+                            before_digest=self._content_key(file_info), after_digest=digest)
+        self._set_content(filename, new_data, digest, "Modified")
+        self.log_message(f"Replaced {filename} with {source_name}")
+        self.log_message(f"Size changed from {old_size} to {len(new_data)} bytes")
+        self._update_history_buttons()
+        return old_size
+
+    def _set_content(self, filename: str, data, digest: str, status: str):
+        """Point an entry at data (whose hash is digest) and refresh everything derived from it."""
+        file_info = self.extracted_files[filename]
+        file_info['data'] = data
+        file_info['content'] = digest
+        file_info['size'] = len(data)
+        file_info['meta'] = asset_metadata(data, 0, len(data), file_info['file_type'])
+        # Previews are keyed by content hash, so nothing needs invalidating
+
+        # If file exists on-disk (legacy extraction), update that too
+        if 'file_path' in file_info:
+            try:
+                with open(file_info['file_path'], 'wb') as f:
+                    f.write(data)
+            except Exception:
+                pass
+
+        file_info['status'] = status
+        file_info.pop('issues', None)  # found in the old bytes
+        self._update_row(filename)
+
+        self.save_modified_button.config(state="normal")
+        self.export_patch_button.config(state="normal")
+        self._update_dirty_label()
+        # Refresh preview if the replaced file is selected
+        cursel = self.file_tree.selection()
+        if cursel and self.file_tree.item(cursel[0], 'text') == filename:
+            self.on_file_select(None)
+
+    @staticmethod
+    def _original_key(file_info: dict) -> str:
+        """Content hash of the entry's archive bytes."""
+        if 'hash' not in file_info:
+            file_info['hash'] = hash_entry(file_info['original_data'])
+        return file_info['hash']
+
+    def _content_key(self, file_info: dict) -> str:
+        """Content hash of the entry's current bytes; the preview cache key."""
+        if 'content' not in file_info:
+            data = file_info['data']
+            file_info['content'] = self._original_key(file_info) if data is file_info['original_data'] else hash_entry(data)
+        return file_info['content']
+
+    # ---------- undo / redo ----------
+    def _restore(self, name: str, digest: str, status: str):
+        file_info = self.extracted_files.get(name)
+        if file_info is None:
+            return
+        # Back to the archive bytes restores the shared view, so the entry reads as unmodified
+        data = file_info['original_data'] if digest == self._original_key(file_info) else self.history.store.get(digest)
+        self._set_content(name, data, digest, status)
+
+    def undo(self):
+        if self.bulk_converter is not None:
+            return  # results of the running bulk replace are still arriving
+        step = self.history.undo()
+        if step is None:
+            return
+        for change in reversed(step):
+            self._restore(change.name, change.before, change.before_status)
+        self.log_message(f"Undid replacement of {self._describe_step(step)}")
+        self._update_history_buttons()
 
-        except Exception as e:
-            messagebox.showerror("Replacement Error", f"Error replacing file: {str(e)}")
-            self.log_message(f"Replacement error: {str(e)}")
-        finally:
-            if converted_path and converted_path != new_file_path:
-                try:
-                    os.unlink(converted_path)
-                except Exception:
-                    pass
+    def redo(self):
+        if self.bulk_converter is not None:
+            return
+        step = self.history.redo()
+        if step is None:
+            return
+        for change in step:
+            self._restore(change.name, change.after, change.after_status)
+        self.log_message(f"Redid replacement of {self._describe_step(step)}")
+        self._update_history_buttons()
+
+    @staticmethod
+    def _describe_step(step) -> str:
+        return step[0].name if len(step) == 1 else f"{step[0].name} and {len(step) - 1} more"
+
+    def _history_shortcut(self, event, handler):
+        if isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Text)):
+            return None  # leave text editing keys to the widget
+        handler()
+        return "break"
+
+    def _update_history_buttons(self):
+        self.undo_button.config(state="normal" if self.history.can_undo else "disabled")
+        self.redo_button.config(state="normal" if self.history.can_redo else "disabled")
+
+    def _clear_history(self):
+        self.history.clear()
+        self._update_history_buttons()
+
+    def bulk_replace(self):
+        """Replace every entry matched by a file in a folder, converting on a process pool."""
+        if not self.extracted_files or self.bulk_converter is not None:
+            return
+        source_dir = filedialog.askdirectory(title="Select folder of replacement files")
+        if not source_dir:
+            return
+        pairs = self._match_replacements(source_dir)
+        if not pairs:
+            where = "its sm/sx/tx subfolders" if self.workspace_namespaced else "that folder"
+            messagebox.showinfo("Bulk Replace", f"No files in {where} match an entry name or index.")
+            return
+        convert = self.auto_convert_var.get()
+        fit = convert and self.fit_to_slot_var.get()
+        jobs = [ConversionJob(name, path, self.extracted_files[name]['file_type'] if convert else None)
+                for name, path in pairs]
+        slots = {name: len(self.extracted_files[name]['original_data']) for name, _ in pairs}
+
+        converter = BulkConverter(cache=self.conversion_cache)
+        self.bulk_converter = converter
+        self.history.begin()  # the whole run is one undo step
+        self.bulk_replace_button.config(state="disabled")
+        self.cancel_bulk_button.config(state="normal")
+        self.log_message(f"Bulk replacing {len(jobs)} entries using {converter.workers} processes...")
+
+        explicit = {name for name, _ in pairs}
+        workspace = self.workspace  # results are dropped if another archive is opened mid-run
+
+        def bulk_worker():
+            done = [0, 0, 0]  # jobs, bytes, failures
+
+            def on_result(result):
+                done[0] += 1
+                slot = slots[result.job.name]
+                if result.error is None and fit and len(result.data) > slot and not converter.cancelled:
+                    # Only oversized results are re-encoded; the search runs on this worker thread
+                    try:
+                        fitted = fit_to_slot(result.job.source_path, result.job.target_type, slot, cache=self.conversion_cache)
+                        self.log_message(f"Fit {os.path.basename(result.job.source_path)}: {describe_settings(fitted.settings)}, "
+                                         f"{len(fitted.data)} bytes ({fitted.leftover} bytes left over)")
+                        result = result._replace(data=fitted.data)
+                    except Exception as e:
+                        result = result._replace(error=str(e))
+                if result.error is not None:
+                    done[2] += 1
+                    self.log_message(f"✗ {os.path.basename(result.job.source_path)}: {result.error}")
+                else:
+                    done[1] += len(result.data)
+                    self.events.call(self._apply_to_copies, workspace, result.job.name, result.data, os.path.basename(result.job.source_path), explicit)
+                self.events.progress("Convert", done[0], done[1])
 
-    def auto_convert_file(self, file_path: str, target_type: str, original_filename: str) -> str:
+            try:
+                self.events.start("Convert", total_items=len(jobs))
+                converter.run(jobs, on_result)
+                state = "cancelled" if converter.cancelled else "complete"
+                self.log_message(f"Bulk replace {state}: {done[0] - done[2]} replaced, {done[2]} failed")
+                self.log_message(f"Conversion cache: {self.conversion_cache.stats()}")
+            except Exception as e:
+                self.log_message(f"✗ Bulk replace failed: {e}")
+            finally:
+                self.events.finish("Convert")
+                self.events.call(self._bulk_replace_done)
+
+        threading.Thread(target=bulk_worker, daemon=True).start()
+
+    def _match_replacements(self, source_dir: str) -> List[Tuple[str, str]]:
+        """Pair replacement files with entries; a workspace reads one subfolder per archive (sx/, tx/...)."""
+        if not self.workspace_namespaced:
+            return match_replacements(source_dir, list(self.extracted_files))
+        pairs = []
+        for namespace in self.workspace.archives:
+            subdir = os.path.join(source_dir, namespace)
+            if os.path.isdir(subdir):
+                names = [Workspace.split_key(name)[1] for name, _ in self._archive_entries(namespace)]
+                pairs += [(self.workspace.entry_key(namespace, name), path) for name, path in match_replacements(subdir, names)]
+        return pairs
+
+    def cancel_bulk_replace(self):
+        if self.bulk_converter is not None:
+            self.bulk_converter.cancel()
+            self.log_message("Cancelling bulk replace...")
+
+    def _bulk_replace_done(self):
+        self.bulk_converter = None
+        self.history.end()
+        self._update_history_buttons()
+        self.bulk_replace_button.config(state="normal")
+        self.cancel_bulk_button.config(state="disabled")
+
+    def _update_fit_state(self):
+        self.fit_to_slot_check.config(state="normal" if self.auto_convert_var.get() else "disabled")
+
+    def auto_convert_file(self, file_path: str, target_type: str, original_filename: str, slot: Optional[int] = None) -> str:
+        """Convert on a worker thread; with slot, fit the encode to slot bytes. Returns a temp path or None."""
         file_ext = os.path.splitext(file_path)[1].lower()
         try:
             if target_type == 'Image':
+                if slot is not None:
+                    return self.convert_image_to_webp(file_path, original_filename, slot)
                 if file_ext not in ['.webp']:
                     return self.convert_image_to_webp(file_path, original_filename)
             elif target_type == 'Audio':
+                if slot is not None:
+                    return self.convert_audio_to_ogg(file_path, original_filename, slot)
                 if file_ext not in ['.ogg']:
                     return self.convert_audio_to_ogg(file_path, original_filename)
         except Exception as e:
             self.log_message(f"Auto-conversion failed: {str(e)}")
-            messagebox.showwarning("Conversion Failed", f"Could not auto-convert file. Using original format.\nError: {str(e)}")
+            self.events.call(messagebox.showwarning, "Conversion Failed", f"Could not auto-convert file. Using original format.\nError: {str(e)}")
         return None
 
-    def convert_image_to_webp(self, input_path: str, original_filename: str) -> str:
+    def _cached_encode(self, input_path: str, target_type: str) -> bytes:
+        """Encode through the conversion cache and log whether it was a hit."""
+        hits = self.conversion_cache.hits
+        data = cached_convert(input_path, target_type, self.conversion_cache)
+        source = "cache hit" if self.conversion_cache.hits > hits else "encoded"
+        self.log_message(f"{os.path.basename(input_path)}: {source} (cache hit rate {self.conversion_cache.hit_rate:.0%})")
+        return data
+
+    def _fit_encode(self, input_path: str, target_type: str, slot: int) -> bytes:
+        """Best-quality encode that fits slot bytes; reports the settings and spare bytes."""
+        self.log_message(f"Searching encoder settings to fit {slot} bytes...")
+        fit = fit_to_slot(input_path, target_type, slot, cache=self.conversion_cache)
+        self.log_message(f"Fit {os.path.basename(input_path)}: {describe_settings(fit.settings)}, "
+                         f"{len(fit.data)} bytes ({fit.leftover} bytes left over)")
+        return fit.data
+
+    @staticmethod
+    def _write_converted(original_filename: str, data: bytes, extension: str) -> str:
+        """Write converted data to a new temp file named after the entry; returns its path."""
+        # Workspace keys carry a namespace ('tx/image_0003.webp'); only the entry name goes in the file name
+        base_name = os.path.splitext(Workspace.split_key(original_filename)[1])[0]
+        fd, path = tempfile.mkstemp(prefix=f"{base_name}_converted_", suffix=extension)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return path
+
+    def convert_image_to_webp(self, input_path: str, original_filename: str, slot: Optional[int] = None) -> str:
+        """Convert to WebP; with slot, search for the best encode no larger than slot bytes."""
         try:
-            with Image.open(input_path) as img:
-                temp_dir = tempfile.gettempdir()
-                base_name = os.path.splitext(original_filename)[0]
-                webp_path = os.path.join(temp_dir, f"{base_name}_converted.webp")
-                if img.mode in ['RGBA', 'LA']:
-                    img.save(webp_path, 'WEBP', lossless=True, quality=95)
-                else:
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    img.save(webp_path, 'WEBP', quality=95)
-                self.log_message(f"Converted {os.path.basename(input_path)} to WebP format")
-                return webp_path
+            if slot is not None:
+                data = self._fit_encode(input_path, 'Image', slot)
+            else:
+                data = self._cached_encode(input_path, 'Image')
+            webp_path = self._write_converted(original_filename, data, '.webp')
+            self.log_message(f"Converted {os.path.basename(input_path)} to WebP format")
+            return webp_path
         except Exception as e:
             raise Exception(f"Image conversion failed: {str(e)}")
 
-    def convert_audio_to_ogg(self, input_path: str, original_filename: str) -> str:
+    def convert_audio_to_ogg(self, input_path: str, original_filename: str, slot: Optional[int] = None) -> str:
+        """Convert to Ogg Vorbis; with slot, search for the best encode no larger than slot bytes."""
+        # Runs on the replace worker thread, so no Tk calls here
+        self.capabilities_ready.wait(10)
         if not self.audio_conversion_enabled:
             raise Exception("Audio conversion not available (pydub/ffmpeg not available)")
         try:
-            audio = AudioSegment.from_file(input_path)
-            temp_dir = tempfile.gettempdir()
-            base_name = os.path.splitext(original_filename)[0]
-            ogg_path = os.path.join(temp_dir, f"{base_name}_converted.ogg")
-            audio.export(ogg_path, format="ogg", codec="libvorbis")
+            if slot is not None:
+                data = self._fit_encode(input_path, 'Audio', slot)
+            else:
+                data = self._cached_encode(input_path, 'Audio')
+            ogg_path = self._write_converted(original_filename, data, '.ogg')
             self.log_message(f"Converted {os.path.basename(input_path)} to OGG format")
             return ogg_path
         except Exception as e:
@@ -551,103 +1181,258 @@ class GameModdingTool:
     def get_conversion_info(self) -> str:
         info = "Auto-conversion capabilities:\n"
         info += "• Images: PNG, JPG, BMP, GIF → WebP ✓\n"
-        if self.audio_conversion_enabled:
+        if not self.capabilities_ready.is_set():
+            info += "• Audio: still checking for pydub/ffmpeg...\n"
+        elif self.audio_conversion_enabled:
             info += "• Audio: MP3, WAV, M4A, etc. → OGG ✓\n"
         else:
             info += "• Audio conversion: Not available (install pydub and ffmpeg)\n"
+        info += f"• Conversion cache: {self.conversion_cache.stats()}\n"
         return info
 
     def find_file_offsets_in_pk(self, pk_data: bytes, target_file_data: bytes) -> int:
-        for i in range(len(pk_data) - len(target_file_data) + 1):
-            if pk_data[i:i + len(target_file_data)] == target_file_data:
-                return i
-        return -1
+        # Single lookup; save_worker resolves many entries through AssetLocator
+        return pk_data.find(target_file_data)
+
+    def _save_targets(self, title: str, extension: str, filetypes: list) -> List[Tuple[str, str, str]]:
+        """(namespace, base .pk, output path) for each archive with changes; [] if cancelled.
+
+        A single archive asks for an output file. A workspace writes one output
+        per changed archive, asking for a folder unless extension is '.pk', in
+        which case the archives are saved back in place.
+        """
+        if not self.workspace_namespaced:
+            path = filedialog.asksaveasfilename(title=title, defaultextension=extension, filetypes=filetypes)
+            return [('', self.current_file, path)] if path else []
+        dirty = self._dirty_archives()
+        if not dirty:
+            return []
+        labels = ", ".join(self._archive_label(ns) for ns in dirty)
+        if extension == ".pk":
+            if not messagebox.askyesno(title, f"Write changes back to {labels}?\nOnly these archives are rewritten; unchanged ones are left alone."):
+                return []
+            return [(ns, self.workspace.path(ns), self.workspace.path(ns)) for ns in dirty]
+        directory = filedialog.askdirectory(title=f"{title} ({labels})")
+        if not directory:
+            return []
+        return [(ns, self.workspace.path(ns), os.path.join(directory, os.path.splitext(self._archive_label(ns))[0] + extension))
+                for ns in dirty]
 
     def save_modified_file(self):
         if not self.current_file or not self.extracted_files:
             messagebox.showwarning("Nothing to Save", "No modifications to save.")
             return
+        if self.workspace_namespaced and not self._dirty_archives():
+            messagebox.showinfo("No Changes", "No modifications were found to save.")
+            return
 
-        save_path = filedialog.asksaveasfilename(title="Save modified .pk file", defaultextension=".pk", filetypes=[("PK files", "*.pk"), ("All files", "*.*")])
-        if not save_path:
+        targets = self._save_targets("Save modified .pk file", ".pk", [("PK files", "*.pk"), ("All files", "*.*")])
+        if not targets:
             return
 
         def save_worker():
             try:
-                self.log_message("Creating modified .pk file...")
-                self.root.update_idletasks()
+                finished = []  # (tmp_path, save_path)
+                issues = []  # problems found re-reading the patched entries
+                modifications_made = 0
+                for namespace, base_path, save_path in targets:
+                    self.log_message(f"Creating modified {os.path.basename(save_path)}...")
+                    patches, count = self._build_patches(base_path, self._archive_entries(namespace))
+                    if count == 0:
+                        continue
+
+                    self.log_message("Writing modified .pk file...")
+
+                    # Write next to the target and swap it in from the UI thread,
+                    # which may first have to unmap the archive being replaced.
+                    tmp_path = save_path + '.tmp'
+                    self.events.start("Write", total_items=1, total_bytes=os.path.getsize(base_path))
+                    written = write_patched_copy(base_path, tmp_path, patches)
+                    self.events.progress("Write", 1, os.path.getsize(tmp_path))
+                    self.events.finish("Write")
+                    self.log_message(f"Patched {written} bytes in {len(patches)} ranges")
+                    finished.append((tmp_path, save_path))
+                    # Check what was written before it replaces anything
+                    issues += [f"{os.path.basename(save_path)} {describe(issue)}" for issue in verify_patches(tmp_path, patches)]
+                    modifications_made += count
 
-                # Read original PK file as a mutable bytearray
-                with open(self.current_file, 'rb') as f:
-                    original_data = bytearray(f.read())
+                if modifications_made == 0:
+                    self.events.call(messagebox.showinfo, "No Changes", "No modifications were found to save.")
+                    return
+                self.events.call(self._finish_save, finished, modifications_made, issues)
 
-                self.log_message(f"Loaded original file: {len(original_data)} bytes")
-                self.root.update_idletasks()
+            except Exception as e:
+                error_msg = f"Error saving modified file: {str(e)}"
+                self.events.call(messagebox.showerror, "Save Error", error_msg)
+                self.log_message(f"✗ {error_msg}")
 
-                modifications_made = 0
-                total_files = len([f for f in self.extracted_files.values() if f['original_data'] != f['data']])
-                processed = 0
+        thread = threading.Thread(target=save_worker, daemon=True)
+        thread.start()
 
-                for filename, file_info in self.extracted_files.items():
-                    original_file_data = file_info['original_data']
-                    new_file_data = file_info['data']
-                    if original_file_data == new_file_data:
-                        continue
+    @traced("build_patches", "patch")
+    def _build_patches(self, pk_path: str, entries: List[Tuple[str, dict]]) -> Tuple[List[Tuple[int, object]], int]:
+        """(offset, data) patches for the modified entries against pk_path, and how many entries they cover."""
+        modifications_made = 0
+        modified = [(name, info) for name, info in entries if self._is_modified(info)]
+        total_files = len(modified)
+        processed = 0
+        patched_bytes = 0
+        patches = []
+
+        # Only patched ranges are written: map the original for validation
+        # and locating, copy it kernel-side and pwrite the changes on top.
+        with span("locate", "patch", entries=len(modified)), PkArchive(pk_path) as original:
+            original_data = original.buffer
+            self.log_message(f"Mapped original file: {len(original)} bytes")
+
+            # Resolve all offsets before patching. Stored offsets are used when
+            # they still validate; the rest go through one locator index.
+            offsets = {}
+            locator = None
+            for filename, file_info in modified:
+                original_file_data = file_info['original_data']
+                offset = file_info.get('offset', None)
+                if offset is None or offset < 0 or original_data[offset:offset + len(original_file_data)] != original_file_data:
+                    if locator is None:
+                        self.log_message("Stored offsets out of date, indexing original file...")
+                        locator = AssetLocator(original_data)
+                    offset = locator.locate(original_file_data)
+                offsets[filename] = offset
+            locator = None
+
+        for filename, file_info in modified:
+            original_file_data = file_info['original_data']
+            new_file_data = file_info['data']
+
+            if processed == 0:
+                self.events.start("Save", total_items=total_files)
+            processed += 1
+            self.log_message(f"Processing {filename} ({processed}/{total_files})...")
+
+            offset = offsets[filename]
+            if offset != -1 and offset is not None:
+                original_size = len(original_file_data)
+                new_size = len(new_file_data)
+
+                if new_size <= original_size:
+                    patches.extend(slot_patches(offset, original_size, new_file_data))
+                    modifications_made += 1
+                    self.log_message(f"✓ Replaced {filename} at offset 0x{offset:08X}")
+                else:
+                    # Cutting it down would write a broken WebP/Ogg; leave the original in place
+                    self.log_message(f"✗ Skipped {filename}: {new_size} bytes do not fit its {original_size} byte slot "
+                                     f"(replace it again with \"Fit to original size\" ticked)")
+            else:
+                self.log_message(f"✗ Could not locate {filename} in original .pk file")
 
-                    processed += 1
-                    self.log_message(f"Processing {filename} ({processed}/{total_files})...")
-                    self.root.update_idletasks()
-
-                    # Prefer stored offset if present
-                    offset = file_info.get('offset', None)
-                    if offset is not None and offset >= 0:
-                        # Validate that the original data matches the pk at that offset
-                        if original_data[offset:offset + len(original_file_data)] != original_file_data:
-                            # mismatch - fallback to searching
-                            offset = self.find_file_offsets_in_pk(original_data, original_file_data)
-                    else:
-                        offset = self.find_file_offsets_in_pk(original_data, original_file_data)
-
-                    if offset != -1 and offset is not None:
-                        original_size = len(original_file_data)
-                        new_size = len(new_file_data)
-
-                        if new_size <= original_size:
-                            original_data[offset:offset + new_size] = new_file_data
-                            if new_size < original_size:
-                                original_data[offset + new_size:offset + original_size] = b'\x00' * (original_size - new_size)
-                            modifications_made += 1
-                            self.log_message(f"✓ Replaced {filename} at offset 0x{offset:08X}")
-                        else:
-                            original_data[offset:offset + original_size] = new_file_data[:original_size]
-                            modifications_made += 1
-                            self.log_message(f"⚠ Replaced {filename} (truncated from {new_size} to {original_size} bytes)")
-                    else:
-                        self.log_message(f"✗ Could not locate {filename} in original .pk file")
+            patched_bytes += len(file_info['original_data'])
+            self.events.progress("Save", processed, patched_bytes)
+        self.events.finish("Save")
+        return patches, modifications_made
 
-                    self.root.update_idletasks()
+    def export_patch(self):
+        """Write the modifications as delta patches, one per changed archive."""
+        if not self.current_file or not self.extracted_files or not self._dirty_archives():
+            messagebox.showwarning("Nothing to Export", "No modifications to export.")
+            return
+        targets = self._save_targets("Export mod patch", PATCH_SUFFIX, [("Cannon Loader patches", f"*{PATCH_SUFFIX}"), ("All files", "*.*")])
+        if not targets:
+            return
 
-                if modifications_made == 0:
-                    self.root.after(0, lambda: messagebox.showinfo("No Changes", "No modifications were found to save."))
+        def export_worker():
+            try:
+                exported = []
+                for namespace, base_path, patch_path in targets:
+                    patches, modifications_made = self._build_patches(base_path, self._archive_entries(namespace))
+                    if modifications_made == 0:
+                        continue
+                    size = write_patch(patch_path, base_path, patches)
+                    self.log_message(f"✓ Patch exported: {patch_path} ({size} bytes, {modifications_made} entries)")
+                    exported.append(f"{patch_path} ({size} bytes)")
+                if not exported:
+                    self.events.call(messagebox.showinfo, "No Changes", "No modifications were found to export.")
                     return
+                self.events.call(messagebox.showinfo, "Success", "Patch exported!\n" + "\n".join(exported))
+            except Exception as e:
+                error_msg = f"Error exporting patch: {str(e)}"
+                self.events.call(messagebox.showerror, "Export Error", error_msg)
+                self.log_message(f"✗ {error_msg}")
 
-                self.log_message("Writing modified .pk file...")
-                self.root.update_idletasks()
-
-                with open(save_path, 'wb') as f:
-                    f.write(original_data)
+        threading.Thread(target=export_worker, daemon=True).start()
 
-                self.root.after(0, lambda: messagebox.showinfo("Success", f"Modified .pk file saved successfully!\nFile: {save_path}\nModifications applied: {modifications_made}"))
-                self.log_message(f"✓ Modified .pk file saved: {save_path}")
-                self.log_message(f"Total modifications applied: {modifications_made}")
+    def apply_patch_file(self):
+        """Verify a stock archive against a delta patch and patch it in place."""
+        patch_path = filedialog.askopenfilename(title="Select mod patch", filetypes=[("Cannon Loader patches", f"*{PATCH_SUFFIX}"), ("All files", "*.*")])
+        if not patch_path:
+            return
+        pk_path = filedialog.askopenfilename(title="Select the stock .pk to patch (a backup is NOT made)", filetypes=[("PK files", "*.pk"), ("All files", "*.*")])
+        if not pk_path:
+            return
+        if self.workspace.namespace_of(pk_path) is not None:
+            messagebox.showwarning("Archive Open", "Close or switch away from this archive before patching it.")
+            return
 
+        def apply_worker():
+            try:
+                self.log_message(f"Verifying {os.path.basename(pk_path)} against the patch...")
+                result = apply_patch(patch_path, pk_path)
+                invalidate_index(pk_path)
+                self.log_message(f"✓ Patched {result['patched_bytes']} bytes in {result['records']} ranges")
+                self.events.call(messagebox.showinfo, "Success", f"Patch applied to {pk_path}")
             except Exception as e:
-                error_msg = f"Error saving modified file: {str(e)}"
-                self.root.after(0, lambda: messagebox.showerror("Save Error", error_msg))
+                error_msg = f"Error applying patch: {str(e)}"
+                self.events.call(messagebox.showerror, "Patch Error", error_msg)
                 self.log_message(f"✗ {error_msg}")
 
-        thread = threading.Thread(target=save_worker, daemon=True)
-        thread.start()
+        threading.Thread(target=apply_worker, daemon=True).start()
+
+    def _finish_save(self, finished: List[Tuple[str, str]], modifications_made: int, issues: Optional[List[str]] = None):
+        if issues:
+            for line in issues:
+                self.log_message(f"✗ {line}")
+            shown = "\n".join(issues[:10]) + (f"\n... and {len(issues) - 10} more" if len(issues) > 10 else "")
+            if not messagebox.askyesno("Verification Failed", f"The modified archive has structural problems:\n{shown}\n\nSave it anyway?"):
+                for tmp_path, _ in finished:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+                self.log_message("Save cancelled; nothing was replaced")
+                return
+        reload = any(self.workspace.namespace_of(save_path) is not None for _, save_path in finished)
+        pending = list(finished)
+        try:
+            if reload:
+                self.clear_preview()
+                self.extracted_files.clear()
+                self._refresh_file_tree()
+                self._close_workspace()
+            while pending:
+                tmp_path, save_path = pending[0]
+                replace_file(tmp_path, save_path)
+                pending.pop(0)
+                self.log_message(f"✓ Modified .pk file saved: {save_path}")
+        except Exception as e:
+            for tmp_path, _ in pending:
+                try:
+                    os.unlink(tmp_path)
+                except Exception:
+                    pass
+            error_msg = f"Error saving modified file: {str(e)}"
+            messagebox.showerror("Save Error", error_msg)
+            self.log_message(f"✗ {error_msg}")
+            if reload:
+                self.extract_files_in_memory()
+            return
+
+        self.log_message(f"Total modifications applied: {modifications_made}")
+        if reload:
+            # Entries pointed into the replaced archives; rescan the saved ones
+            self.extract_files_in_memory()
+        else:
+            self._update_dirty_label()
+        files = "\n".join(save_path for _, save_path in finished)
+        messagebox.showinfo("Success", f"Modified .pk file saved successfully!\nFile: {files}\nModifications applied: {modifications_made}")
 
     def on_file_select(self, event):
         selection = self.file_tree.selection()
@@ -667,43 +1452,40 @@ class GameModdingTool:
         self.info_text.configure(state=tk.NORMAL)
         self.info_text.delete('1.0', tk.END)
         self.info_text.insert(tk.END, f"Filename: {filename}\nType: {file_type}\nSize: {file_size} bytes\n")
+        meta = file_info.get('meta', {})
+        for label, text in (("Dimensions", format_dimensions(meta)), ("Duration", format_duration(meta)), ("Format", format_details(meta))):
+            if text:
+                self.info_text.insert(tk.END, f"{label}: {text}\n")
+        for problem in file_info.get('issues', ()):
+            self.info_text.insert(tk.END, f"Problem: {problem}\n")
+        copies = self._identical_copies(filename)
+        if copies:
+            listed = ", ".join(copies[:5]) + (f" and {len(copies) - 5} more" if len(copies) > 5 else "")
+            self.info_text.insert(tk.END, f"Identical copies ({len(copies)}): {listed}\n")
         self.info_text.configure(state=tk.DISABLED)
 
         # stop playback
         self.stop_audio()
 
         if file_type == 'Image':
-            try:
-                data = file_info['data']
-                img = Image.open(io.BytesIO(data))
-                max_w, max_h = 800, 600
-                img.thumbnail((max_w, max_h), Image.LANCZOS)
-                self.current_image_tk = ImageTk.PhotoImage(img)
-                self.image_label.configure(image=self.current_image_tk, text="")
+            self.audio_controls.grid_remove()
+            key = self._content_key(file_info)
+            img = self.thumbnails.get(key)
+            if img is not None:
+                self._show_thumbnail(key, img, None)
+            else:
+                self.current_image_tk = None
+                self.image_label.configure(image='', text="Decoding preview...")
                 self.preview_type_var.set("Image Preview")
-                self.audio_controls.grid_remove()
-            except Exception as e:
-                self.image_label.configure(image='', text=f"Could not preview image:\n{e}")
-                self.preview_type_var.set("Image Preview (error)")
-                self.audio_controls.grid_remove()
+                self.thumbnails.request(key, file_info['data'],
+                                        lambda key, img, error: self.events.call(self._show_thumbnail, key, img, error))
+            self._prefetch_thumbnails(selected_item)
         elif file_type == 'Audio':
-            try:
-                fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1] or '.ogg')
-                os.close(fd)
-                with open(tmp_path, 'wb') as tf:
-                    tf.write(file_info['data'])
-                self.current_audio_tempfile = tmp_path
-                self.preview_type_var.set("Audio Preview")
-                self.image_label.configure(image='', text=f"Audio: {filename}\nSize: {file_size} bytes")
-                self.audio_controls.grid()
-                try:
-                    pygame.mixer.music.set_volume(self.volume_var.get())
-                except Exception:
-                    pass
-            except Exception as e:
-                self.image_label.configure(image='', text=f"Could not prepare audio preview:\n{e}")
-                self.preview_type_var.set("Audio Preview (error)")
-                self.audio_controls.grid_remove()
+            # Played straight from the in-memory bytes; no temp file
+            self.current_audio = filename
+            self.preview_type_var.set("Audio Preview")
+            self.image_label.configure(image='', text=f"Audio: {filename}\nSize: {file_size} bytes")
+            self.audio_controls.grid()
         else:
             try:
                 display = file_info['data'][:256]
@@ -716,49 +1498,80 @@ class GameModdingTool:
                 self.preview_type_var.set("Unknown Preview")
                 self.audio_controls.grid_remove()
 
-    def play_audio(self):
+    def _show_thumbnail(self, key: str, img, error):
+        selection = self.file_tree.selection()
+        info = self.extracted_files.get(self.file_tree.item(selection[0], 'text')) if selection else None
+        if info is None or self._content_key(info) != key:
+            return  # selection moved on (or was replaced) while decoding
+        if error is not None:
+            self.current_image_tk = None
+            self.image_label.configure(image='', text=f"Could not preview image:\n{error}")
+            self.preview_type_var.set("Image Preview (error)")
+            return
+        from PIL import ImageTk
+        with span("photo_image", "preview"):
+            self.current_image_tk = ImageTk.PhotoImage(img)
+        self.image_label.configure(image=self.current_image_tk, text="")
+        self.preview_type_var.set("Image Preview")
+
+    def _prefetch_thumbnails(self, item: str):
+        """Queue decodes for image rows around item so arrow-key browsing hits the cache."""
+        for step in (self.file_tree.next, self.file_tree.prev):
+            neighbour = item
+            for _ in range(self.PREFETCH_DISTANCE):
+                neighbour = step(neighbour)
+                if not neighbour:
+                    break
+                name = self.file_tree.item(neighbour, 'text')
+                info = self.extracted_files.get(name)
+                if info is not None and info['file_type'] == 'Image':
+                    self.thumbnails.request(self._content_key(info), info['data'])
+
+    def play_audio(self, which: str = 'current'):
+        """Play the selected clip; which='original' plays the bytes from the archive for A/B."""
+        self._wait_for_capabilities()
         if not self.audio_enabled:
             messagebox.showwarning("Audio disabled", "Audio playback not available (pygame mixer failed).")
             return
-        if not self.current_audio_tempfile or not os.path.exists(self.current_audio_tempfile):
+        import pygame
+        file_info = self.extracted_files.get(self.current_audio)
+        if file_info is None:
             messagebox.showwarning("No audio", "No audio selected for playback.")
             return
+        data = file_info['original_data'] if which == 'original' else file_info['data']
         with self.playback_lock:
             try:
                 try:
-                    pygame.mixer.music.stop()
+                    pygame.mixer.stop()
                 except Exception:
                     pass
-                pygame.mixer.music.load(self.current_audio_tempfile)
-                pygame.mixer.music.set_volume(self.volume_var.get())
-                pygame.mixer.music.play(loops=0)
-                self.log_message(f"Playing audio: {os.path.basename(self.current_audio_tempfile)}")
+                key = self._original_key(file_info) if which == 'original' else self._content_key(file_info)
+                sound = self.sounds.get(key, data)
+                self.current_channel = sound.play()
+                if self.current_channel is not None:
+                    self.current_channel.set_volume(self.volume_var.get())
+                label = " (original)" if which == 'original' else ""
+                self.log_message(f"Playing audio: {self.current_audio}{label}")
             except Exception as e:
                 messagebox.showerror("Playback Error", f"Could not play audio: {e}")
                 self.log_message(f"Playback error: {e}")
 
     def stop_audio(self):
         with self.playback_lock:
-            try:
-                if self.audio_enabled:
-                    try:
-                        pygame.mixer.music.stop()
-                    except Exception:
-                        pass
-            finally:
-                if self.current_audio_tempfile:
-                    try:
-                        os.unlink(self.current_audio_tempfile)
-                    except Exception:
-                        pass
-                    self.current_audio_tempfile = None
+            if self.audio_enabled:
+                try:
+                    import pygame
+                    pygame.mixer.stop()
+                except Exception:
+                    pass
+            self.current_channel = None
 
     def on_volume_change(self, val):
         try:
             v = float(val)
-            if self.audio_enabled:
+            if self.audio_enabled and self.current_channel is not None:
                 try:
-                    pygame.mixer.music.set_volume(v)
+                    self.current_channel.set_volume(v)
                 except Exception:
                     pass
         except Exception:
@@ -777,6 +1590,7 @@ class GameModdingTool:
         self.preview_type_var.set("No file selected")
         self.audio_controls.grid_remove()
         self.current_image_tk = None
+        self.current_audio = None
 
     def _cleanup_on_exit(self):
         try:
@@ -784,11 +1598,29 @@ class GameModdingTool:
         except Exception:
             pass
         try:
-            pygame.mixer.quit()
+            self._close_workspace()
+        except Exception:
+            pass
+        try:
+            self.thumbnails.shutdown()
+        except Exception:
+            pass
+        try:
+            self.history.clear()  # removes spilled history blobs
         except Exception:
             pass
+        if self.bulk_converter is not None:
+            self.bulk_converter.cancel()
+        if self.audio_enabled:
+            try:
+                import pygame
+                pygame.mixer.quit()
+            except Exception:
+                pass
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # bulk conversion workers in frozen builds
+    enable_from_env()  # CANNONLOADER_TRACE=trace.json records a timeline of the session
     root = tk.Tk()
     try:
         app = GameModdingTool(root)
@@ -0,0 +1,204 @@
+# Redcon .pk archive access (memory-mapped, zero-copy)
+import mmap
+import os
+import shutil
+import weakref
+from typing import Iterable, List, Tuple
+
+from redcon_trace import span, traced
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class PkArchive:
+    """Read-only memory-mapped .pk file handing out memoryview slices.
+
+    Slices share the pages of the mapping, so nothing is copied until a caller
+    explicitly asks for bytes (e.g. when an entry gets replaced).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # mmap refuses empty files
+                self._map = b""
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._map)
+        self._exports = weakref.WeakSet()
+
+    @property
+    def buffer(self):
+        """Buffer supporting find/slicing/struct access (the mmap itself)."""
+        return self._map
+
+    def view(self, offset: int, size: int) -> memoryview:
+        """Return a zero-copy view of (offset, size), clamped to the file end."""
+        if offset < 0 or offset > self.size:
+            raise ValueError(f"Offset {offset} outside archive ({self.size} bytes)")
+        mv = self._view[offset:offset + size]
+        self._exports.add(mv)
+        return mv
+
+    def read(self, offset: int, size: int) -> bytes:
+        """Return an owned copy of (offset, size)."""
+        return bytes(self._map[offset:offset + size])
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        """Release every view handed out, then unmap and close the file."""
+        if self._file is None:
+            return
+        try:
+            for mv in list(self._exports):
+                mv.release()
+            self._view.release()
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+        except BufferError:
+            # Someone still holds a sub-slice; the mapping goes away with it.
+            pass
+        self._map = b""
+        self._file.close()
+        self._file = None
+
+    @property
+    def closed(self) -> bool:
+        return self._file is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _copy_fd(src_fd: int, dst_fd: int, size: int):
+    """Copy size bytes between descriptors, kernel-side where the OS allows it.
+
+    copy_file_range can share extents on reflink filesystems and sendfile
+    avoids user-space buffers; both fall back to a plain read/write loop.
+    """
+    copied = 0
+    for name in ("copy_file_range", "sendfile"):
+        fn = getattr(os, name, None)
+        if fn is None:
+            continue
+        try:
+            while copied < size:
+                if name == "copy_file_range":
+                    n = fn(src_fd, dst_fd, size - copied, copied, copied)
+                else:
+                    os.lseek(dst_fd, copied, os.SEEK_SET)
+                    n = fn(dst_fd, src_fd, copied, size - copied)
+                if n == 0:
+                    break
+                copied += n
+            if copied >= size:
+                return
+        except OSError:
+            # e.g. EXDEV/EINVAL across filesystems; continue where we stopped
+            pass
+    with os.fdopen(os.dup(src_fd), "rb") as src, os.fdopen(os.dup(dst_fd), "wb") as dst:
+        src.seek(copied)
+        dst.seek(copied)
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def _pwrite_all(fd: int, data, offset: int):
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            n = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            n = os.write(fd, view)
+        view = view[n:]
+        offset += n
+
+
+def slot_patches(offset: int, slot_size: int, data) -> List[Tuple[int, object]]:
+    """Patches writing data into a slot_size entry at offset, zero-filling the rest."""
+    if len(data) > slot_size:
+        raise ValueError(f"{len(data)} bytes do not fit a {slot_size} byte slot")
+    patches = [(offset, data)]
+    if len(data) < slot_size:
+        patches.append((offset + len(data), bytes(slot_size - len(data))))
+    return patches
+
+
+def write_patched_copy(src_path: str, tmp_path: str, patches: Iterable[Tuple[int, object]]) -> int:
+    """Copy src_path to tmp_path and overwrite only the patched ranges.
+
+    patches is an iterable of (offset, data). The copy is fsynced so it can be
+    swapped in with replace_file. Returns the number of patched bytes written.
+    """
+    written = 0
+    flags = os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    src_fd = os.open(src_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        dst_fd = os.open(tmp_path, flags, 0o666)
+        try:
+            size = os.fstat(src_fd).st_size
+            with span("copy", "io", bytes=size):
+                _copy_fd(src_fd, dst_fd, size)
+            with span("write_patches", "io") as trace:
+                for offset, data in patches:
+                    _pwrite_all(dst_fd, data, offset)
+                    written += len(data)
+                trace.set(bytes=written)
+            with span("fsync", "io"):
+                os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        os.close(src_fd)
+    return written
+
+
+def patch_file(path: str, patches: Iterable[Tuple[int, object]]) -> int:
+    """Overwrite the patched ranges of path in place and fsync it.
+
+    Not atomic, so only for files the caller owns (a build output), never the
+    stock archive. Returns the number of patched bytes written.
+    """
+    written = 0
+    fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        with span("write_patches", "io") as trace:
+            for offset, data in patches:
+                _pwrite_all(fd, data, offset)
+                written += len(data)
+            trace.set(bytes=written)
+        with span("fsync", "io"):
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    return written
+
+
+@traced("replace_file", "io")
+def replace_file(tmp_path: str, dst_path: str):
+    """Atomically move a finished temp file over dst_path."""
+    os.replace(tmp_path, dst_path)
+    if hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself (POSIX only)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(dst_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,303 @@
+# Redcon headless pipeline (list / extract / replace / pack / apply / watch without the GUI)
+#
+# Prints one JSON document on stdout (watch also prints one JSON line per rebuild) and exits with:
+#   0 everything succeeded, 1 some entries failed, 2 bad arguments, 3 fatal error
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from redcon_archive import PkArchive, replace_file, slot_patches, write_patched_copy
+from redcon_convert import BulkConverter, ConversionCache, ConversionJob, match_replacements, prepare_replacement
+from redcon_dedup import DedupIndex
+from redcon_index import IndexEntry, invalidate_index
+from redcon_patch import PatchError, apply_patch, write_patch
+from redcon_scanner import FILE_TYPE_KINDS, classify
+import redcon_trace
+from redcon_verify import describe, verify_file, verify_patches
+from redcon_watch import DEBOUNCE, POLL_INTERVAL, WatchSession
+from redcon_workspace import Workspace, named_entries, scan_file
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+
+
+class CliError(Exception):
+    """Fatal error reported as {"ok": false, "error": ...} with EXIT_ERROR."""
+
+
+def log(message: str):
+    print(message, file=sys.stderr)
+
+
+def entry_json(name: str, entry: IndexEntry) -> dict:
+    off, size, ftype, digest, meta = entry
+    return {"name": name, "offset": off, "size": size, "type": ftype, "hash": digest, **meta}
+
+
+def cmd_list(args) -> tuple:
+    entries = named_entries(scan_file(args.pk))
+    return EXIT_OK, {
+        "archive": args.pk,
+        "content_type": classify(FILE_TYPE_KINDS[e[2]] for e in entries.values()),
+        "entries": [entry_json(name, entry) for name, entry in entries.items()],
+    }
+
+
+def cmd_extract(args) -> tuple:
+    os.makedirs(args.output_dir, exist_ok=True)
+    extracted = []
+    entries = named_entries(scan_file(args.pk))
+    with redcon_trace.span("extract", "io", archive=os.path.basename(args.pk)), PkArchive(args.pk) as archive:
+        for name, entry in entries.items():
+            if args.type and entry[2].lower() != args.type:
+                continue
+            path = os.path.join(args.output_dir, name)
+            with open(path, "wb") as f:
+                f.write(archive.view(entry[0], entry[1]))
+            extracted.append({**entry_json(name, entry), "path": path})
+    return EXIT_OK, {"archive": args.pk, "output_dir": args.output_dir, "entries": extracted}
+
+
+def dedup_index(entries: Dict[str, IndexEntry]) -> DedupIndex:
+    return DedupIndex((name, entry[3], entry[1]) for name, entry in entries.items())
+
+
+def cmd_dups(args) -> tuple:
+    index = DedupIndex()
+    with Workspace(args.pk, namespaced=len(args.pk) > 1) as workspace:
+        for namespace, archive in workspace.archives.items():
+            for name, entry in named_entries(scan_file(archive.path)).items():
+                index.add(workspace.entry_key(namespace, name), entry[3], entry[1])
+    groups = [{"size": index.group_size(names), "copies": len(names), "entries": names} for names in index.groups()]
+    return EXIT_OK, {
+        "archives": args.pk,
+        "entries": len(index),
+        "duplicate_entries": index.duplicate_entries,
+        "duplicate_bytes": index.duplicate_bytes,
+        "groups": groups,
+    }
+
+
+def cmd_verify(args) -> tuple:
+    records, issues = verify_file(args.pk)
+    return (EXIT_PARTIAL if issues else EXIT_OK), {
+        "archive": args.pk,
+        "entries": len(records),
+        "issues": [{"offset": i.offset, "size": i.size, "kind": i.kind, "problem": i.problem} for i in issues],
+    }
+
+
+def apply_replacements(pk_path: str, output: Optional[str], pairs: List[tuple], convert: bool = True, fit: bool = False,
+                       workers: Optional[int] = None, use_cache: bool = True, patch: Optional[str] = None,
+                       all_copies: bool = False) -> tuple:
+    """Convert pairs of (entry_name, source_path) in parallel, then write the patched
+    archive to output and/or a delta patch against pk_path to patch.
+
+    With all_copies, entries identical to a replaced one get the same data,
+    unless they are replaced explicitly themselves.
+    """
+    cache = ConversionCache() if use_cache else None
+    entries = named_entries(scan_file(pk_path))
+    unknown = [name for name, _ in pairs if name not in entries]
+    if unknown:
+        raise CliError(f"Unknown entries: {', '.join(unknown)}")
+
+    jobs = [ConversionJob(name, path, entries[name][2] if convert else None) for name, path in pairs]
+    dedup = dedup_index(entries) if all_copies else None
+    explicit = {name for name, _ in pairs}
+    report = []
+    patches = []
+
+    def on_result(result):
+        name = result.job.name
+        off, slot = entries[name][0], entries[name][1]
+        data, fields = prepare_replacement(result, entries[name], fit, workers, cache)
+        item = {"name": name, **fields}
+        if data is not None:
+            patches.extend(slot_patches(off, slot, data))
+            if dedup is not None:
+                copies = [copy for copy in dedup.copies(name) if copy not in explicit]
+                for copy in copies:
+                    patches.extend(slot_patches(entries[copy][0], slot, data))
+                item["copies"] = copies
+        report.append(item)
+        log(f"{'✗' if 'error' in item else '✓'} {name} <- {os.path.basename(item['source'])}")
+
+    BulkConverter(workers, cache).run(jobs, on_result)
+    report.sort(key=lambda item: item["offset"])
+    failed = sum(1 for item in report if "error" in item)
+
+    written = 0
+    patch_size = None
+    if len(report) > failed:
+        if patch:
+            patch_size = write_patch(patch, pk_path, patches)
+        if output:
+            # Stream the stock archive through a kernel-side copy and patch on top
+            tmp_path = output + ".tmp"
+            written = write_patched_copy(pk_path, tmp_path, patches)
+            issues = verify_patches(tmp_path, patches)
+            if issues:
+                os.unlink(tmp_path)
+                raise CliError(f"Patched archive failed verification: {'; '.join(describe(i) for i in issues)}")
+            replace_file(tmp_path, output)
+    result = {
+        "archive": pk_path,
+        "output": output if output and len(report) > failed else None,
+        "patch": {"path": patch, "size": patch_size} if patch_size is not None else None,
+        "replaced": len(report) - failed,
+        "failed": failed,
+        "patched_bytes": written,
+        "entries": report,
+    }
+    if cache is not None:
+        result["cache"] = {"hits": cache.hits, "misses": cache.misses, "hit_rate": round(cache.hit_rate, 3)}
+    return (EXIT_PARTIAL if failed else EXIT_OK), result
+
+
+def cmd_replace(args) -> tuple:
+    return apply_replacements(args.pk, args.output, [(args.entry, args.file)], not args.no_convert, args.fit,
+                              args.workers, not args.no_cache, args.patch, args.all_copies)
+
+
+def cmd_pack(args) -> tuple:
+    names = list(named_entries(scan_file(args.pk)))
+    pairs = match_replacements(args.replacements, names)
+    if not pairs:
+        raise CliError(f"No files in {args.replacements} match an entry name or index")
+    return apply_replacements(args.pk, args.output, pairs, not args.no_convert, args.fit, args.workers, not args.no_cache,
+                              args.patch, args.all_copies)
+
+
+def cmd_apply(args) -> tuple:
+    result = apply_patch(args.patch, args.pk, verify_only=args.verify_only, require_base=not args.allow_modified_base)
+    if not args.verify_only:
+        invalidate_index(args.pk)
+    return EXIT_OK, {"archive": args.pk, "patch": args.patch, **result}
+
+
+def cmd_watch(args) -> tuple:
+    if not os.path.isdir(args.replacements):
+        raise CliError(f"Not a directory: {args.replacements}")
+    cache = ConversionCache() if not args.no_cache else None
+    session = WatchSession(args.pk, args.replacements, args.output, not args.no_convert, args.fit, args.workers, cache,
+                           args.debounce)
+    stop = threading.Event()
+
+    def on_report(report):
+        for item in report.get("entries", []):
+            mark = "↺" if item.get("restored") else "✗" if "error" in item else "✓"
+            log(f"{mark} {item['name']}" + (f" <- {os.path.basename(item['source'])}" if "source" in item else ""))
+        if "error" in report:
+            log(f"Watch error: {report['error']}")
+        json.dump(report, sys.stdout)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+    log(f"Watching {args.replacements} -> {args.output} (Ctrl+C to stop)")
+    try:
+        session.run(stop, on_report, args.interval)
+    except KeyboardInterrupt:
+        stop.set()
+    return EXIT_OK, {"archive": args.pk, "replacements": args.replacements, "output": args.output, "builds": session.builds,
+                     "applied": len(session.applied)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="redcon_cli", description="Headless Redcon .pk tool; prints JSON on stdout")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome/Perfetto trace of the run and a stage summary on stderr")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="list the entries of a .pk")
+    p.add_argument("pk")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("dups", help="group identical entries within and across archives")
+    p.add_argument("pk", nargs="+")
+    p.set_defaults(func=cmd_dups)
+
+    p = sub.add_parser("verify", help="check Ogg page CRCs, RIFF sizes and overlapping entries")
+    p.add_argument("pk")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("extract", help="write every entry to a directory")
+    p.add_argument("pk")
+    p.add_argument("output_dir")
+    p.add_argument("--type", choices=("image", "audio"), help="only extract this type")
+    p.set_defaults(func=cmd_extract)
+
+    def add_patch_options(p):
+        p.add_argument("-o", "--output", help="patched .pk to write (may be the input)")
+        p.add_argument("--patch", help="also (or instead) write a delta patch against the input .pk")
+        p.add_argument("--no-convert", action="store_true", help="use replacement files as-is")
+        p.add_argument("--fit", action="store_true", help="re-encode oversized replacements to fit their slot")
+        p.add_argument("--workers", type=int, default=None, help="conversion processes (default: all cores)")
+        p.add_argument("--no-cache", action="store_true", help="skip the conversion cache")
+        p.add_argument("--all-copies", action="store_true", help="also replace entries identical to a replaced one")
+
+    p = sub.add_parser("replace", help="replace one entry")
+    p.add_argument("pk")
+    p.add_argument("entry", help="entry name, e.g. audio_0003.ogg")
+    p.add_argument("file")
+    add_patch_options(p)
+    p.set_defaults(func=cmd_replace)
+
+    p = sub.add_parser("pack", help="apply a directory of replacements matched by entry name or index")
+    p.add_argument("pk")
+    p.add_argument("replacements")
+    add_patch_options(p)
+    p.set_defaults(func=cmd_pack)
+
+    p = sub.add_parser("apply", help="verify a stock .pk against a delta patch and patch it in place")
+    p.add_argument("patch")
+    p.add_argument("pk")
+    p.add_argument("--verify-only", action="store_true", help="check the archive without writing")
+    p.add_argument("--allow-modified-base", action="store_true",
+                   help="accept an archive that differs outside the patched ranges")
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("watch", help="rebuild a patched .pk whenever files in a replacements directory change")
+    p.add_argument("pk")
+    p.add_argument("replacements")
+    p.add_argument("-o", "--output", required=True, help="patched .pk to keep up to date (not the input)")
+    p.add_argument("--no-convert", action="store_true", help="use replacement files as-is")
+    p.add_argument("--fit", action="store_true", help="re-encode oversized replacements to fit their slot")
+    p.add_argument("--workers", type=int, default=None, help="conversion processes (default: all cores)")
+    p.add_argument("--no-cache", action="store_true", help="skip the conversion cache")
+    p.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between checks of the directory")
+    p.add_argument("--debounce", type=float, default=DEBOUNCE,
+                   help="seconds a file must stay unchanged before it is rebuilt")
+    p.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in ("replace", "pack") and not (args.output or args.patch):
+        parser.error("give -o/--output, --patch or both")
+    if args.trace:
+        redcon_trace.enable()
+    try:
+        code, result = args.func(args)
+        result = {"ok": code == EXIT_OK, **result}
+    except (CliError, PatchError, OSError, ValueError) as e:
+        code, result = EXIT_ERROR, {"ok": False, "error": str(e)}
+    except Exception as e:
+        # Anything else (a decoder, a bad lookup...) still ends in JSON and EXIT_ERROR
+        code, result = EXIT_ERROR, {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        if args.trace:
+            redcon_trace.finish(args.trace)
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
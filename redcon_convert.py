@@ -0,0 +1,480 @@
+# Redcon asset conversion (WebP/Ogg encoders and a parallel bulk stage)
+import functools
+import hashlib
+import importlib.metadata
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from redcon_index import IndexEntry
+from redcon_scanner import FILE_TYPE_KINDS
+from redcon_trace import span
+from redcon_verify import CHECKS, repair_ogg_crcs
+
+WEBP_QUALITY = 95
+OGG_CODEC = "libvorbis"
+# Extensions already in the archive's format; these are passed through untouched
+NATIVE_EXTENSIONS = {"Image": ".webp", "Audio": ".ogg"}
+CACHE_FORMAT = 1  # bump to orphan every cached output
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Fit-to-slot ladders, ordered from best quality to smallest output. Method 6
+# is libwebp's strongest compression, so it gives the smallest file per quality.
+WEBP_FIT_LADDER = [{"encoder": "webp", "lossless": True, "quality": 100, "method": 6}] + [
+    {"encoder": "webp", "lossless": False, "quality": q, "method": 6} for q in range(100, -1, -5)]
+OGG_FIT_LADDER = (
+    [{"encoder": "ogg", "quality": q, "sample_rate": None, "channels": None} for q in range(10, -2, -1)]
+    + [{"encoder": "ogg", "quality": q, "sample_rate": 22050, "channels": None} for q in (2, 1, 0, -1)]
+    + [{"encoder": "ogg", "quality": q, "sample_rate": 22050, "channels": 1} for q in (1, 0, -1)]
+    + [{"encoder": "ogg", "quality": None, "bitrate": b, "sample_rate": 11025, "channels": 1} for b in ("32k", "24k", "16k")]
+)
+
+
+def encode_webp(input_path: str, quality: int = WEBP_QUALITY, lossless: Optional[bool] = None, method: int = 4) -> bytes:
+    """Encode an image file to WebP bytes; images with alpha default to lossless."""
+    from PIL import Image
+    with Image.open(input_path) as img:
+        if lossless is None:
+            lossless = img.mode in ('RGBA', 'LA')
+        if img.mode not in ('RGB', 'RGBA', 'LA'):
+            img = img.convert('RGB')
+        out = io.BytesIO()
+        img.save(out, 'WEBP', lossless=lossless, quality=quality, method=method)
+        return out.getvalue()
+
+
+def encode_ogg(input_path: str, codec: str = OGG_CODEC, bitrate: Optional[str] = None, parameters: Optional[List[str]] = None) -> bytes:
+    """Encode an audio file to Ogg bytes through pydub/ffmpeg."""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(input_path)
+    out = io.BytesIO()
+    audio.export(out, format="ogg", codec=codec, bitrate=bitrate, parameters=parameters)
+    return out.getvalue()
+
+
+def convert_file(input_path: str, target_type: Optional[str]) -> bytes:
+    """Bytes of input_path in the archive format for target_type ('Image' or 'Audio').
+
+    A target_type of None passes the file through unconverted.
+    """
+    ext = os.path.splitext(input_path)[1].lower()
+    if target_type is None or ext == NATIVE_EXTENSIONS.get(target_type):
+        with open(input_path, 'rb') as f:
+            return f.read()
+    if target_type == 'Image':
+        with span("encode_webp", "convert", source=os.path.basename(input_path)):
+            return encode_webp(input_path)
+    if target_type == 'Audio':
+        with span("encode_ogg", "convert", source=os.path.basename(input_path)):
+            return encode_ogg(input_path)
+    raise ValueError(f"No converter for file type {target_type!r}")
+
+
+def encode_with(input_path: str, settings: dict) -> bytes:
+    """Encode input_path with one rung of a fit ladder; picklable for the probe pool."""
+    if settings["encoder"] == "webp":
+        return encode_webp(input_path, quality=settings["quality"], lossless=settings["lossless"], method=settings["method"])
+    if settings["encoder"] == "ogg":
+        parameters = []
+        if settings.get("quality") is not None:
+            parameters += ["-q:a", str(settings["quality"])]
+        if settings.get("sample_rate"):
+            parameters += ["-ar", str(settings["sample_rate"])]
+        if settings.get("channels"):
+            parameters += ["-ac", str(settings["channels"])]
+        return encode_ogg(input_path, OGG_CODEC, bitrate=settings.get("bitrate"), parameters=parameters)
+    raise ValueError(f"Unknown encoder {settings['encoder']!r}")
+
+
+def describe_settings(settings: dict) -> str:
+    """Short human-readable form of a ladder rung for the log."""
+    if settings["encoder"] == "webp":
+        mode = "lossless" if settings["lossless"] else f"quality {settings['quality']}"
+        return f"WebP {mode}, method {settings['method']}"
+    parts = [f"bitrate {settings['bitrate']}" if settings.get("bitrate") else f"quality {settings['quality']}"]
+    if settings.get("sample_rate"):
+        parts.append(f"{settings['sample_rate']} Hz")
+    if settings.get("channels") == 1:
+        parts.append("mono")
+    return "Vorbis " + ", ".join(parts)
+
+
+class FitResult(NamedTuple):
+    data: bytes
+    settings: dict
+    slot: int  # size of the entry being replaced
+
+    @property
+    def leftover(self) -> int:
+        return self.slot - len(self.data)
+
+
+def fit_to_slot(input_path: str, target_type: str, slot: int, workers: Optional[int] = None,
+                cache: Optional["ConversionCache"] = None) -> FitResult:
+    """Best-quality encode of input_path that is no larger than slot bytes.
+
+    The ladder for target_type is searched k-ary: each round encodes up to
+    `workers` evenly spaced rungs of the unresolved range in parallel and
+    narrows the range to just above the best rung that fit. Raises
+    ValueError if even the smallest rung is too large.
+    """
+    ladder = WEBP_FIT_LADDER if target_type == 'Image' else OGG_FIT_LADDER if target_type == 'Audio' else None
+    if ladder is None:
+        raise ValueError(f"No converter for file type {target_type!r}")
+    workers = workers or os.cpu_count() or 1
+    source = None
+    if cache is not None:
+        with open(input_path, 'rb') as f:
+            source = f.read()
+
+    sizes = {}  # rung -> encoded size
+    best = None  # (rung, data)
+    lo, hi = 0, len(ladder)  # rungs in [lo, hi) are unresolved
+    with span("fit_to_slot", "convert", source=os.path.basename(input_path), slot=slot) as trace, \
+            ProcessPoolExecutor(max_workers=min(workers, len(ladder))) as pool:
+        while lo < hi:
+            count = min(max(workers, 2), hi - lo)  # at least bisect when probing serially
+            probes = sorted({lo + (hi - lo) * i // count for i in range(count)})
+            outputs = {}
+            futures = {}
+            for rung in probes:
+                key = cache.key(source, cache_settings(ladder[rung])) if cache is not None else None
+                data = cache.get(key) if key is not None else None
+                if data is not None:
+                    outputs[rung] = data
+                else:
+                    futures[pool.submit(encode_with, input_path, ladder[rung])] = (rung, key)
+            for future, (rung, key) in futures.items():
+                outputs[rung] = future.result()
+                if key is not None:
+                    cache.put(key, outputs[rung])
+            fitting = [rung for rung in probes if len(outputs[rung]) <= slot]
+            for rung in probes:
+                sizes[rung] = len(outputs[rung])
+            if fitting:
+                first = fitting[0]
+                best = (first, outputs[first])
+                hi = first
+            lo = max([rung + 1 for rung in probes if rung < hi] + [lo])
+        trace.set(probes=len(sizes))
+    if best is None:
+        raise ValueError(f"Smallest encode ({min(sizes.values())} bytes, {describe_settings(ladder[-1])}) "
+                         f"does not fit the {slot} byte slot")
+    return FitResult(best[1], ladder[best[0]], slot)
+
+
+@functools.lru_cache(maxsize=None)
+def encoder_versions(encoder: str) -> tuple:
+    """(library, version) pairs behind an encoder, so cached outputs miss after an upgrade.
+
+    A missing library reports None; the encode itself then fails with the real error.
+    """
+    if encoder == "webp":
+        try:
+            import PIL
+            return (("pillow", PIL.__version__),)
+        except ImportError:
+            return (("pillow", None),)
+    if encoder == "ogg":
+        try:
+            from pydub import AudioSegment
+            pydub_version = importlib.metadata.version("pydub")
+            converter = AudioSegment.converter
+        except (ImportError, importlib.metadata.PackageNotFoundError):
+            return (("pydub", None), ("ffmpeg", None))
+        try:
+            out = subprocess.run([converter, "-version"], capture_output=True, text=True, timeout=10).stdout
+            ffmpeg_version = out.splitlines()[0].strip() if out else None
+        except (OSError, subprocess.SubprocessError):
+            ffmpeg_version = None
+        return (("pydub", pydub_version), ("ffmpeg", ffmpeg_version))
+    return ()
+
+
+def cache_settings(settings: dict) -> dict:
+    """settings plus the versions of the encoder it names; what cache keys are built from."""
+    return {**settings, **dict(encoder_versions(settings.get("encoder") or ""))}
+
+
+def conversion_settings(target_type: Optional[str]) -> dict:
+    """Encoder settings convert_file uses for target_type; part of every cache key."""
+    if target_type == 'Image':
+        return cache_settings({"encoder": "webp", "quality": WEBP_QUALITY, "lossless": "auto", "method": 4})
+    if target_type == 'Audio':
+        return cache_settings({"encoder": "ogg", "codec": OGG_CODEC, "bitrate": None})
+    return {"encoder": None}
+
+
+def needs_conversion(input_path: str, target_type: Optional[str]) -> bool:
+    ext = os.path.splitext(input_path)[1].lower()
+    return target_type is not None and ext != NATIVE_EXTENSIONS.get(target_type)
+
+
+def default_cache_dir() -> str:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cannonloader", "conversions")
+
+
+class ConversionCache:
+    """On-disk store of encoded outputs keyed by source bytes and encoder settings.
+
+    Entries are files named by key; a hit refreshes the file's mtime and the
+    oldest files are evicted once the store grows past max_bytes.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total = None  # bytes on disk, computed on first store
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source: bytes, settings: dict) -> str:
+        h = hashlib.sha256(source)
+        h.update(json.dumps({"format": CACHE_FORMAT, **settings}, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with span("cache.get", "io"):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with span("cache.put", "io", bytes=len(data)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._files())
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    yield entry.path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        files = sorted(self._files(), key=lambda f: f[2])
+        self._total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                self._total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            if os.path.isdir(self.directory):
+                for path, _, _ in list(self._files()):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+            self._total = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> str:
+        return f"{self.hits} hits / {self.hits + self.misses} lookups ({self.hit_rate:.0%})"
+
+
+def cached_convert(input_path: str, target_type: Optional[str], cache: Optional[ConversionCache]) -> bytes:
+    """convert_file, answered from cache when the same source was encoded before."""
+    if cache is None or not needs_conversion(input_path, target_type):
+        return convert_file(input_path, target_type)
+    with open(input_path, 'rb') as f:
+        key = cache.key(f.read(), conversion_settings(target_type))
+    data = cache.get(key)
+    if data is None:
+        data = convert_file(input_path, target_type)
+        cache.put(key, data)
+    return data
+
+
+def match_replacements(source_dir: str, entry_names: List[str]) -> List[Tuple[str, str]]:
+    """Pair files in source_dir with entries -> [(entry_name, source_path)].
+
+    A file matches an entry by full name, by stem ('audio_0003.wav' ->
+    'audio_0003.ogg') or, when its stem is a number, by index in entry_names.
+    """
+    by_name = {name: name for name in entry_names}
+    by_stem = {os.path.splitext(name)[0]: name for name in entry_names}
+    pairs = []
+    for filename in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, filename)
+        if not os.path.isfile(path):
+            continue
+        stem = os.path.splitext(filename)[0]
+        name = by_name.get(filename) or by_stem.get(stem)
+        if name is None and stem.isdigit() and int(stem) < len(entry_names):
+            name = entry_names[int(stem)]
+        if name is not None:
+            pairs.append((name, path))
+    return pairs
+
+
+class ConversionJob(NamedTuple):
+    name: str  # entry the result replaces
+    source_path: str
+    target_type: Optional[str]  # 'Image', 'Audio' or None to pass through
+
+
+class ConversionResult(NamedTuple):
+    job: ConversionJob
+    data: Optional[bytes]
+    error: Optional[str]
+
+
+def prepare_replacement(result: ConversionResult, entry: IndexEntry, fit: bool = False,
+                        workers: Optional[int] = None, cache: Optional[ConversionCache] = None) -> tuple:
+    """Bytes to write into entry's slot for a conversion result -> (data or None, report fields).
+
+    Oversized results are re-encoded to fit when fit is set, Ogg page CRCs
+    are repaired, and data that is not a valid entry of the slot's kind or
+    does not fit is rejected with an "error" field.
+    """
+    off, slot = entry[0], entry[1]
+    item = {"source": result.job.source_path, "offset": off, "slot": slot}
+    data = result.data
+    if result.error is None and len(data) > slot and fit and result.job.target_type is not None:
+        try:
+            fitted = fit_to_slot(result.job.source_path, result.job.target_type, slot, workers, cache)
+            data = fitted.data
+            item["settings"] = describe_settings(fitted.settings)
+        except Exception as e:
+            result = result._replace(error=str(e))
+    if result.error is not None:
+        item["error"] = result.error
+        return None, item
+    kind = FILE_TYPE_KINDS[entry[2]]
+    if kind == "ogg":
+        data, fixed = repair_ogg_crcs(data)
+        if fixed:
+            item["repaired_pages"] = fixed
+    problems = CHECKS[kind](data, 0, len(data))
+    if problems:
+        item["error"] = f"not a valid {kind} entry: {'; '.join(problems)}"
+    elif len(data) > slot:
+        item["error"] = f"{len(data)} bytes do not fit the {slot} byte slot"
+    else:
+        item["size"] = len(data)
+        item["leftover"] = slot - len(data)
+        return data, item
+    return None, item
+
+
+class BulkConverter:
+    """Fans conversions out over a process pool sized to the available cores.
+
+    run() blocks, so call it from a worker thread; cancel() may be called
+    from any thread and stops jobs that have not started yet.
+    """
+
+    def __init__(self, workers: Optional[int] = None, cache: Optional[ConversionCache] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def run(self, jobs: Iterable[ConversionJob], on_result: Optional[Callable[[ConversionResult], None]] = None) -> List[ConversionResult]:
+        results = []
+
+        def report(result: ConversionResult):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        # Cache hits are answered here; only misses reach the pool
+        misses = []
+        for job in jobs:
+            if self.cancelled:
+                return results
+            if self.cache is None or not needs_conversion(job.source_path, job.target_type):
+                misses.append((job, None))
+                continue
+            try:
+                with open(job.source_path, 'rb') as f:
+                    key = self.cache.key(f.read(), conversion_settings(job.target_type))
+            except OSError as e:
+                report(ConversionResult(job, None, str(e)))
+                continue
+            data = self.cache.get(key)
+            if data is not None:
+                report(ConversionResult(job, data, None))
+            else:
+                misses.append((job, key))
+        if not misses:
+            return results
+
+        # Encodes run in worker processes, so the trace shows the pool as one span
+        with span("bulk_convert", "convert", jobs=len(misses)), \
+                ProcessPoolExecutor(max_workers=min(self.workers, len(misses))) as pool:
+            futures = {pool.submit(convert_file, job.source_path, job.target_type): (job, key) for job, key in misses}
+            for future in as_completed(futures):
+                if self.cancelled:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                job, key = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    report(ConversionResult(job, None, str(e)))
+                    continue
+                if key is not None:
+                    self.cache.put(key, data)
+                report(ConversionResult(job, data, None))
+        return results
@@ -0,0 +1,59 @@
+# Redcon duplicate assets (entries grouped by content hash within and across archives)
+from typing import Dict, Iterable, List, Tuple
+
+ContentKey = Tuple[str, int]  # (content hash from the scan index, size)
+
+
+class DedupIndex:
+    """Entry names grouped by identical content.
+
+    Built from the hashes the scan already stores per entry, so grouping
+    costs no extra pass over the archives. Names are whatever the caller
+    uses as entry keys ('sx/audio_0003.ogg' in a workspace).
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, int]] = ()):
+        self._groups: Dict[ContentKey, List[str]] = {}
+        self._content: Dict[str, ContentKey] = {}
+        for name, digest, size in entries:
+            self.add(name, digest, size)
+
+    def add(self, name: str, digest: str, size: int):
+        key = (digest, size)
+        self._content[name] = key
+        self._groups.setdefault(key, []).append(name)
+
+    def copies(self, name: str) -> List[str]:
+        """Other entries with the same content as name ([] if it is unique or unknown)."""
+        key = self._content.get(name)
+        if key is None:
+            return []
+        return [other for other in self._groups[key] if other != name]
+
+    def groups(self) -> List[List[str]]:
+        """Every group of two or more identical entries, most wasted bytes first."""
+        dups = [(key, names) for key, names in self._groups.items() if len(names) > 1]
+        dups.sort(key=lambda item: -(len(item[1]) - 1) * item[0][1])
+        return [names for _, names in dups]
+
+    def group_size(self, names: List[str]) -> int:
+        return self._content[names[0]][1]
+
+    @property
+    def duplicate_entries(self) -> int:
+        """Entries that are a copy of an earlier one."""
+        return sum(len(names) - 1 for names in self._groups.values())
+
+    @property
+    def duplicate_bytes(self) -> int:
+        return sum((len(names) - 1) * size for (_, size), names in self._groups.items())
+
+    def summary(self) -> str:
+        groups = sum(1 for names in self._groups.values() if len(names) > 1)
+        if not groups:
+            return "No duplicate assets"
+        return (f"{groups} assets stored more than once: {self.duplicate_entries} extra copies, "
+                f"{self.duplicate_bytes / (1024 * 1024):.1f} MB")
+
+    def __len__(self):
+        return len(self._content)
@@ -0,0 +1,95 @@
+# Redcon background task events (thread-safe log/progress channel for the Tk loop)
+import queue
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+
+class Event(NamedTuple):
+    kind: str  # 'log', 'start', 'progress', 'finish' or 'call'
+    stage: str
+    payload: tuple
+    time: float
+
+
+class EventChannel:
+    """Queue that background tasks post to; the UI thread drains it in batches.
+
+    Posting never touches Tk, so any thread may log or report progress.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def _post(self, kind: str, stage: str = "", *payload):
+        self._queue.put(Event(kind, stage, payload, time.monotonic()))
+
+    def log(self, message: str):
+        self._post("log", "", message)
+
+    def start(self, stage: str, total_items: int = 0, total_bytes: int = 0):
+        self._post("start", stage, total_items, total_bytes)
+
+    def progress(self, stage: str, items: int, nbytes: int = 0):
+        """Report cumulative items and bytes processed so far in stage."""
+        self._post("progress", stage, items, nbytes)
+
+    def finish(self, stage: str):
+        self._post("finish", stage)
+
+    def call(self, fn: Callable, *args):
+        """Run fn(*args) on the UI thread at the next drain."""
+        self._post("call", "", fn, args)
+
+    def drain(self, limit: Optional[int] = None) -> List[Event]:
+        events = []
+        while limit is None or len(events) < limit:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+class ProgressMeter:
+    """Tracks the current stage from drained events and formats its rates."""
+
+    def __init__(self):
+        self.stage = ""
+        self.active = False
+        self.total_items = 0
+        self.total_bytes = 0
+        self.items = 0
+        self.nbytes = 0
+        self._started = 0.0
+        self._last = 0.0
+
+    def update(self, event: Event):
+        if event.kind == "start":
+            self.stage = event.stage
+            self.active = True
+            self.total_items, self.total_bytes = event.payload
+            self.items = self.nbytes = 0
+            self._started = self._last = event.time
+        elif event.kind == "progress" and event.stage == self.stage:
+            self.items, self.nbytes = event.payload
+            self._last = event.time
+        elif event.kind == "finish" and event.stage == self.stage:
+            self.active = False
+            self._last = event.time
+
+    @property
+    def fraction(self) -> float:
+        if self.total_bytes:
+            return min(1.0, self.nbytes / self.total_bytes)
+        if self.total_items:
+            return min(1.0, self.items / self.total_items)
+        return 0.0 if self.active else 1.0
+
+    def text(self) -> str:
+        if not self.stage:
+            return "Idle"
+        elapsed = max(self._last - self._started, 1e-6)
+        count = f"{self.items}/{self.total_items}" if self.total_items else f"{self.items}"
+        rates = f"{self.items / elapsed:.0f} entries/s, {self.nbytes / elapsed / 1e6:.1f} MB/s"
+        state = "" if self.active else " (done)"
+        return f"{self.stage}: {count} entries{state} - {rates}"
@@ -0,0 +1,206 @@
+# Redcon replacement history (undo/redo over a content-addressed blob store)
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+from redcon_index import hash_entry
+
+HISTORY_LIMIT = 500  # undo steps kept
+HISTORY_MEMORY_BYTES = 128 * 1024 * 1024  # replacement bytes kept in RAM before spilling to disk
+
+
+class BlobStore:
+    """Reference-counted blobs keyed by content hash.
+
+    Each distinct content is held once however many edits refer to it.
+    Views into a mapped archive cost nothing to keep; owned buffers are kept
+    in memory up to max_memory, least recently used ones spill to a temp
+    directory and are read back on demand.
+    """
+
+    def __init__(self, max_memory: int = HISTORY_MEMORY_BYTES, spill_dir: Optional[str] = None):
+        self.max_memory = max_memory
+        self._spill_root = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._memory: "OrderedDict[str, object]" = OrderedDict()  # digest -> data, LRU order
+        self._refs: Dict[str, int] = {}
+        self._owned = 0  # bytes of owned buffers in _memory
+
+    @staticmethod
+    def _is_owned(data) -> bool:
+        return not isinstance(data, memoryview)
+
+    def put(self, data, digest: Optional[str] = None) -> str:
+        """Add a reference to data; pass digest when it is already known to skip hashing."""
+        digest = digest or hash_entry(data)
+        if digest in self._refs:
+            self._refs[digest] += 1
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+            return digest
+        self._refs[digest] = 1
+        self._memory[digest] = data
+        if self._is_owned(data):
+            self._owned += len(data)
+            self._spill()
+        return digest
+
+    def get(self, digest: str):
+        data = self._memory.get(digest)
+        if data is not None:
+            self._memory.move_to_end(digest)
+            return data
+        with open(self._spill_path(digest), "rb") as f:
+            return f.read()
+
+    def release(self, digest: str):
+        refs = self._refs.get(digest, 0) - 1
+        if refs > 0:
+            self._refs[digest] = refs
+            return
+        self._refs.pop(digest, None)
+        data = self._memory.pop(digest, None)
+        if data is None:
+            try:
+                os.unlink(self._spill_path(digest))
+            except OSError:
+                pass
+        elif self._is_owned(data):
+            self._owned -= len(data)
+
+    def _spill_path(self, digest: str) -> str:
+        return os.path.join(self._spill_dir or "", digest)
+
+    def _spill(self):
+        if self._owned <= self.max_memory:
+            return
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="cannonloader-history-", dir=self._spill_root)
+        for digest in list(self._memory):
+            if self._owned <= self.max_memory:
+                break
+            data = self._memory[digest]
+            if not self._is_owned(data):
+                continue
+            with open(self._spill_path(digest), "wb") as f:
+                f.write(data)
+            del self._memory[digest]
+            self._owned -= len(data)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._owned
+
+    def __len__(self):
+        return len(self._refs)
+
+    def clear(self):
+        self._memory.clear()
+        self._refs.clear()
+        self._owned = 0
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+
+class Change(NamedTuple):
+    name: str
+    before: str  # content hash
+    after: str
+    before_status: str
+    after_status: str
+
+
+class EditHistory:
+    """Undo/redo stacks of steps; a step is the list of entry changes made together.
+
+    Changes refer to content by hash, so the history itself is a few small
+    tuples per edit and the bytes live once in the shared BlobStore.
+    """
+
+    def __init__(self, store: Optional[BlobStore] = None, limit: int = HISTORY_LIMIT):
+        self.store = store if store is not None else BlobStore()
+        self.limit = limit
+        self._undo: List[List[Change]] = []
+        self._redo: List[List[Change]] = []
+        self._open: Optional[List[Change]] = None
+        self._depth = 0
+
+    def record(self, name: str, before_data, after_data, before_status: str, after_status: str,
+               before_digest: Optional[str] = None, after_digest: Optional[str] = None) -> Change:
+        """Record that name went from before_data to after_data; returns the change."""
+        change = Change(name, self.store.put(before_data, before_digest), self.store.put(after_data, after_digest),
+                        before_status, after_status)
+        if self._open is not None:
+            self._open.append(change)
+        else:
+            self._push([change])
+        return change
+
+    def begin(self):
+        """Start grouping recorded changes into one step (nestable)."""
+        self._depth += 1
+        if self._open is None:
+            self._open = []
+
+    def end(self):
+        self._depth = max(0, self._depth - 1)
+        if self._depth == 0 and self._open is not None:
+            step, self._open = self._open, None
+            if step:
+                self._push(step)
+
+    @contextmanager
+    def group(self):
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.end()
+
+    def _release(self, step: List[Change]):
+        for change in step:
+            self.store.release(change.before)
+            self.store.release(change.after)
+
+    def _push(self, step: List[Change]):
+        for dropped in self._redo:
+            self._release(dropped)
+        self._redo.clear()
+        self._undo.append(step)
+        while len(self._undo) > self.limit:
+            self._release(self._undo.pop(0))
+
+    def undo(self) -> Optional[List[Change]]:
+        """Pop the last step; the caller restores each change's 'before', last change first."""
+        if not self._undo:
+            return None
+        step = self._undo.pop()
+        self._redo.append(step)
+        return step
+
+    def redo(self) -> Optional[List[Change]]:
+        """Pop the last undone step; the caller restores each change's 'after' in order."""
+        if not self._redo:
+            return None
+        step = self._redo.pop()
+        self._undo.append(step)
+        return step
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._open = None
+        self._depth = 0
+        self.store.clear()
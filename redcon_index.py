@@ -0,0 +1,78 @@
+# Redcon .pk scan index (sidecar cache of scan results)
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".clindex"
+SAMPLE_SIZE = 64 * 1024
+
+# (offset, size, file_type, content hash, header metadata)
+IndexEntry = Tuple[int, int, str, str, dict]
+
+
+def index_path(pk_path: str) -> str:
+    return pk_path + INDEX_SUFFIX
+
+
+def hash_entry(data) -> str:
+    """Content hash stored per entry (accepts bytes, memoryview or mmap slices)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def archive_fingerprint(pk_path: str) -> dict:
+    """Cheap identity of an archive: size, mtime and a hash of its head and tail."""
+    st = os.stat(pk_path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(pk_path, "rb") as f:
+        h.update(f.read(SAMPLE_SIZE))
+        if st.st_size > SAMPLE_SIZE:
+            f.seek(max(SAMPLE_SIZE, st.st_size - SAMPLE_SIZE))
+            h.update(f.read(SAMPLE_SIZE))
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sample": h.hexdigest()}
+
+
+def load_index(pk_path: str, mode: str) -> Optional[List[IndexEntry]]:
+    """Return cached entries for pk_path, or None if missing or stale."""
+    try:
+        with open(index_path(pk_path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION or index.get("mode") != mode:
+            return None
+        if index.get("fingerprint") != archive_fingerprint(pk_path):
+            return None
+        return [(int(off), int(sz), str(ftype), str(digest), dict(meta)) for off, sz, ftype, digest, meta in index["entries"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_index(pk_path: str, mode: str, entries: List[IndexEntry]) -> bool:
+    """Write the sidecar index; returns False if it could not be written."""
+    index = {
+        "version": INDEX_VERSION,
+        "mode": mode,
+        "fingerprint": archive_fingerprint(pk_path),
+        "entries": [list(e) for e in entries],
+    }
+    tmp_path = index_path(pk_path) + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_path, index_path(pk_path))
+        return True
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def invalidate_index(pk_path: str) -> bool:
+    """Delete the sidecar index; returns True if one existed."""
+    try:
+        os.unlink(index_path(pk_path))
+        return True
+    except FileNotFoundError:
+        return False
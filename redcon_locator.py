@@ -0,0 +1,55 @@
+# Redcon .pk asset locator (indexed replacement for the byte-by-byte search)
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SIGNATURES = (b"RIFF", b"OggS")
+ANCHOR_SIZE = 64
+
+
+class AssetLocator:
+    """Find where asset bytes live in an archive.
+
+    One pass over the archive records the leading ANCHOR_SIZE bytes of every
+    RIFF/OggS structure start. Looking an asset up is then a dict hit on its
+    own header plus one full compare, instead of a compare at every byte.
+    """
+
+    def __init__(self, buf, offsets: Optional[Iterable[int]] = None):
+        self._buf = buf
+        self._length = len(buf)
+        self._anchors: Dict[bytes, List[int]] = {}
+        if offsets is None:
+            offsets = self._signature_offsets()
+        for off in offsets:
+            anchor = bytes(buf[off:off + ANCHOR_SIZE])
+            self._anchors.setdefault(anchor, []).append(off)
+
+    def _signature_offsets(self) -> List[int]:
+        offsets = []
+        for sig in SIGNATURES:
+            pos = self._buf.find(sig)
+            while pos != -1:
+                offsets.append(pos)
+                pos = self._buf.find(sig, pos + 1)
+        offsets.sort()
+        return offsets
+
+    def _matches(self, offset: int, data) -> bool:
+        end = offset + len(data)
+        if offset < 0 or end > self._length:
+            return False
+        with memoryview(self._buf) as mv:
+            return mv[offset:end] == data
+
+    def locate(self, data, hint: Optional[int] = None) -> int:
+        """Return the offset of data in the archive, or -1."""
+        if hint is not None and hint >= 0 and self._matches(hint, data):
+            return hint
+        for off in self._anchors.get(bytes(data[:ANCHOR_SIZE]), ()):
+            if self._matches(off, data):
+                return off
+        # Not aligned to a known structure start; let the C search handle it
+        return self._buf.find(data)
+
+    def locate_all(self, targets: Dict[str, Tuple[object, Optional[int]]]) -> Dict[str, int]:
+        """Resolve {name: (data, hint)} -> {name: offset or -1} against the one index."""
+        return {name: self.locate(data, hint) for name, (data, hint) in targets.items()}
@@ -0,0 +1,111 @@
+# Redcon asset metadata from headers only (no image or audio decode)
+import struct
+from typing import Optional
+
+from redcon_scanner import OGG_PAGE_HEADER_SIZE, OGG_SIGNATURE, _ViewBuffer
+
+VP8_START_CODE = b"\x9d\x01\x2a"
+VP8L_SIGNATURE = 0x2F
+VP8X_ALPHA_FLAG = 0x10
+VORBIS_ID_HEADER = b"\x01vorbis"
+
+
+def webp_metadata(buf, offset: int, size: int) -> dict:
+    """{'codec', 'width', 'height', 'alpha'} of the RIFF/WEBP entry at offset, or {} if unparsable."""
+    pos = offset + 12  # first chunk after RIFF <size> WEBP
+    end = offset + size
+    if pos + 8 > end:
+        return {}
+    fourcc = bytes(buf[pos:pos + 4])
+    data = pos + 8
+    if fourcc == b"VP8X" and data + 10 <= end:
+        flags = buf[data]
+        width = 1 + int.from_bytes(buf[data + 4:data + 7], "little")
+        height = 1 + int.from_bytes(buf[data + 7:data + 10], "little")
+        return {"codec": "VP8X", "width": width, "height": height, "alpha": bool(flags & VP8X_ALPHA_FLAG)}
+    if fourcc == b"VP8L" and data + 5 <= end and buf[data] == VP8L_SIGNATURE:
+        bits = struct.unpack_from("<I", buf, data + 1)[0]
+        width = 1 + (bits & 0x3FFF)
+        height = 1 + ((bits >> 14) & 0x3FFF)
+        return {"codec": "VP8L", "width": width, "height": height, "alpha": bool((bits >> 28) & 1)}
+    if fourcc == b"VP8 " and data + 10 <= end and bytes(buf[data + 3:data + 6]) == VP8_START_CODE:
+        width, height = struct.unpack_from("<HH", buf, data + 6)
+        return {"codec": "VP8", "width": width & 0x3FFF, "height": height & 0x3FFF, "alpha": False}
+    return {}
+
+
+def _last_granule(buf, offset: int, end: int) -> Optional[int]:
+    """Granule position of the last page that ends exactly at end."""
+    # Entries are often memoryviews into the mapped archive, which have no rfind
+    search = buf if hasattr(buf, "rfind") else _ViewBuffer(buf)
+    pos = search.rfind(OGG_SIGNATURE, offset, end)
+    while pos != -1:
+        seg_table = pos + OGG_PAGE_HEADER_SIZE
+        if seg_table <= end and buf[pos + 4] == 0:
+            segments = buf[pos + 26]
+            if seg_table + segments <= end and seg_table + segments + sum(buf[seg_table:seg_table + segments]) == end:
+                granule = struct.unpack_from("<q", buf, pos + 6)[0]
+                return granule if granule >= 0 else None
+        # "OggS" inside packet data; keep looking further back
+        pos = search.rfind(OGG_SIGNATURE, offset, pos)
+    return None
+
+
+def ogg_metadata(buf, offset: int, size: int) -> dict:
+    """{'rate', 'channels', 'bitrate', 'duration'} of the Ogg Vorbis stream at offset, or {} if unparsable.
+
+    Rate, channels and nominal bitrate come from the identification header in
+    the first page; duration is the last page's granule position over the rate.
+    """
+    end = offset + size
+    if offset + OGG_PAGE_HEADER_SIZE > end:
+        return {}
+    packet = offset + OGG_PAGE_HEADER_SIZE + buf[offset + 26]
+    if packet + 30 > end or bytes(buf[packet:packet + 7]) != VORBIS_ID_HEADER:
+        return {}
+    channels = buf[packet + 11]
+    rate, _, nominal, _ = struct.unpack_from("<Iiii", buf, packet + 12)
+    if not rate:
+        return {}
+    meta = {"rate": rate, "channels": channels, "bitrate": nominal if nominal > 0 else None, "duration": None}
+    granule = _last_granule(buf, offset, end)
+    if granule is not None:
+        meta["duration"] = granule / rate
+    return meta
+
+
+def asset_metadata(buf, offset: int, size: int, file_type: str) -> dict:
+    """Header metadata for an entry of file_type ('Image' or 'Audio')."""
+    try:
+        if file_type == "Image":
+            return webp_metadata(buf, offset, size)
+        if file_type == "Audio":
+            return ogg_metadata(buf, offset, size)
+    except (IndexError, struct.error):
+        pass
+    return {}
+
+
+def format_dimensions(meta: dict) -> str:
+    return f"{meta['width']}×{meta['height']}" if "width" in meta else ""
+
+
+def format_duration(meta: dict) -> str:
+    duration = meta.get("duration")
+    if duration is None:
+        return ""
+    minutes, seconds = divmod(duration, 60)
+    return f"{int(minutes)}:{seconds:05.2f}"
+
+
+def format_details(meta: dict) -> str:
+    """One-line summary: 'VP8L, alpha' or '44100 Hz stereo, 96 kbps'."""
+    if "codec" in meta:
+        return f"{meta['codec']}, alpha" if meta["alpha"] else meta["codec"]
+    if "rate" in meta:
+        channels = {1: "mono", 2: "stereo"}.get(meta["channels"], f"{meta['channels']} ch")
+        text = f"{meta['rate']} Hz {channels}"
+        if meta.get("bitrate"):
+            text += f", {meta['bitrate'] // 1000} kbps"
+        return text
+    return ""
@@ -0,0 +1,176 @@
+# Redcon .pk delta patches (compact mod distribution, streamed apply)
+#
+# Layout, little-endian:
+#   header  magic "CLPATCH\0", version u16, base size u64, base hash 16s, record count u32
+#   record  offset u64, length u32, kind u8, original hash 16s, then `length` new bytes
+#           (kind RECORD_ZERO carries no bytes: the range is zero-filled)
+import hashlib
+import os
+import struct
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Tuple
+
+from redcon_archive import COPY_CHUNK_SIZE, PkArchive, _pwrite_all
+from redcon_trace import traced
+
+PATCH_MAGIC = b"CLPATCH\0"
+PATCH_VERSION = 1
+PATCH_SUFFIX = ".clpatch"
+HEADER = struct.Struct("<8sHQ16sI")
+RECORD = struct.Struct("<QIB16s")
+RECORD_DATA = 0
+RECORD_ZERO = 1
+
+
+class PatchError(Exception):
+    """The patch is malformed or does not match the archive it is applied to."""
+
+
+class PatchHeader(NamedTuple):
+    base_size: int
+    base_hash: bytes
+    count: int
+
+
+class PatchRecord(NamedTuple):
+    offset: int
+    length: int
+    kind: int
+    original_hash: bytes
+
+
+def _digest(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def file_digest(path: str) -> bytes:
+    """Hash of a whole file, read in bounded chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                return h.digest()
+            h.update(chunk)
+
+
+@traced("write_patch", "io")
+def write_patch(patch_path: str, base_path: str, patches: Iterable[Tuple[int, object]]) -> int:
+    """Write the (offset, data) patches for base_path as a delta patch; returns its size.
+
+    All-zero ranges (the padding after a shrunk entry) are stored as zero-fill records.
+    """
+    patches = sorted(patches, key=lambda p: p[0])
+    with PkArchive(base_path) as base, open(patch_path + ".tmp", "wb") as out:
+        out.write(HEADER.pack(PATCH_MAGIC, PATCH_VERSION, len(base), file_digest(base_path), len(patches)))
+        for offset, data in patches:
+            if offset < 0 or offset + len(data) > len(base):
+                raise PatchError(f"Patch at 0x{offset:08X} runs past the end of {base_path}")
+            original_hash = _digest(base.view(offset, len(data)))
+            zero = data == bytes(len(data))
+            out.write(RECORD.pack(offset, len(data), RECORD_ZERO if zero else RECORD_DATA, original_hash))
+            if not zero:
+                out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+        size = out.tell()
+    os.replace(patch_path + ".tmp", patch_path)
+    return size
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise PatchError("Patch file is truncated")
+    return data
+
+
+def read_header(f: BinaryIO) -> PatchHeader:
+    magic, version, base_size, base_hash, count = HEADER.unpack(_read_exact(f, HEADER.size))
+    if magic != PATCH_MAGIC:
+        raise PatchError("Not a Cannon Loader patch")
+    if version != PATCH_VERSION:
+        raise PatchError(f"Unsupported patch version {version}")
+    return PatchHeader(base_size, base_hash, count)
+
+
+def iter_records(f: BinaryIO, header: PatchHeader) -> Iterator[PatchRecord]:
+    """Yield records in order; the caller must consume each record's bytes before the next."""
+    for _ in range(header.count):
+        yield PatchRecord(*RECORD.unpack(_read_exact(f, RECORD.size)))
+
+
+def _range_digest(fd: int, offset: int, length: int) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    while length:
+        if hasattr(os, "pread"):
+            chunk = os.pread(fd, min(length, COPY_CHUNK_SIZE), offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            chunk = os.read(fd, min(length, COPY_CHUNK_SIZE))
+        if not chunk:
+            break
+        h.update(chunk)
+        offset += len(chunk)
+        length -= len(chunk)
+    return h.digest()
+
+
+def mismatched_ranges(patch_path: str, pk_path: str) -> list:
+    """Offsets of records whose original bytes are not what pk_path holds."""
+    mismatched = []
+    fd = os.open(pk_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        with open(patch_path, "rb") as f:
+            header = read_header(f)
+            for record in iter_records(f, header):
+                if record.offset + record.length > size or _range_digest(fd, record.offset, record.length) != record.original_hash:
+                    mismatched.append(record.offset)
+                if record.kind == RECORD_DATA:
+                    f.seek(record.length, os.SEEK_CUR)
+    finally:
+        os.close(fd)
+    return mismatched
+
+
+@traced("apply_patch", "io")
+def apply_patch(patch_path: str, pk_path: str, verify_only: bool = False, require_base: bool = True) -> dict:
+    """Verify pk_path against the patch, then patch it in place.
+
+    By default the whole archive must hash to the patch's base. With
+    require_base=False an archive that differs elsewhere (e.g. another mod)
+    is accepted as long as every range the patch touches still holds its
+    original bytes. The patch is streamed in COPY_CHUNK_SIZE pieces, so
+    memory stays bounded however large the mod is, and nothing is written
+    unless verification passes.
+    """
+    with open(patch_path, "rb") as f:
+        header = read_header(f)
+        size = os.path.getsize(pk_path)
+        base_match = size == header.base_size and file_digest(pk_path) == header.base_hash
+        if not base_match:
+            mismatched = mismatched_ranges(patch_path, pk_path)
+            if require_base or mismatched:
+                detail = f"{len(mismatched)} of {header.count} patched ranges differ" if mismatched else "the patched ranges still match"
+                raise PatchError(f"{pk_path} is not the archive this patch was made for ({detail})")
+        if verify_only:
+            return {"records": header.count, "patched_bytes": 0, "base_match": base_match}
+
+        written = 0
+        fd = os.open(pk_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        try:
+            for record in iter_records(f, header):
+                if record.offset + record.length > size:
+                    raise PatchError(f"Record at 0x{record.offset:08X} runs past the end of the archive")
+                pos, remaining = record.offset, record.length
+                while remaining:
+                    n = min(remaining, COPY_CHUNK_SIZE)
+                    chunk = bytes(n) if record.kind == RECORD_ZERO else _read_exact(f, n)
+                    _pwrite_all(fd, chunk, pos)
+                    pos += n
+                    remaining -= n
+                written += record.length
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return {"records": header.count, "patched_bytes": written, "base_match": base_match}
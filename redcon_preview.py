@@ -0,0 +1,155 @@
+# Redcon asset previews (background thumbnail decoding with an LRU cache)
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from redcon_trace import span
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+THUMBNAIL_SIZE = (800, 600)
+THUMBNAIL_CACHE_BYTES = 96 * 1024 * 1024
+DECODE_WORKERS = 2
+SOUND_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def decode_thumbnail(data, size=THUMBNAIL_SIZE) -> "Image.Image":
+    """Decode image bytes and shrink them to fit size."""
+    from PIL import Image
+    with span("decode_thumbnail", "preview", bytes=len(data)):
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail(size, Image.LANCZOS)
+    return img
+
+
+def image_nbytes(img: "Image.Image") -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class ThumbnailCache:
+    """Memory-bounded LRU of decoded thumbnails, filled by a worker pool.
+
+    Results come back through on_done(key, image, error) on a worker thread;
+    callers hand them to the UI thread themselves. clear() makes any decode
+    still in flight discard its result.
+    """
+
+    def __init__(self, max_bytes: int = THUMBNAIL_CACHE_BYTES, workers: int = DECODE_WORKERS):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self._bytes = 0
+        self._pending: Dict[str, Tuple[int, List[Callable]]] = {}  # key -> (version, waiters)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+    def get(self, key: str) -> Optional["Image.Image"]:
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+            return img
+
+    def request(self, key: str, data, on_done: Optional[Callable] = None):
+        """Decode data for key in the background unless cached; joins a decode already queued."""
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+            else:
+                waiters = [on_done] if on_done is not None else []
+                pending = self._pending.get(key)
+                if pending is not None:
+                    pending[1].extend(waiters)
+                    return
+                version = self._versions.get(key, 0)
+                self._pending[key] = (version, waiters)
+        if img is not None:
+            if on_done is not None:
+                on_done(key, img, None)
+            return
+        self._pool.submit(self._decode, key, data, version)
+
+    def _decode(self, key: str, data, version: int):
+        img = error = None
+        try:
+            img = decode_thumbnail(data)
+        except Exception as e:
+            error = e
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending[0] != version:
+                return  # cleared while decoding
+            del self._pending[key]
+            if img is not None:
+                self._store(key, img)
+        for on_done in pending[1]:
+            on_done(key, img, error)
+
+    def _store(self, key: str, img: "Image.Image"):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= image_nbytes(old)
+        self._items[key] = img
+        self._bytes += image_nbytes(img)
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= image_nbytes(evicted)
+
+    def clear(self):
+        with self._lock:
+            for key in set(self._items) | set(self._pending):
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._items.clear()
+            self._pending.clear()
+            self._bytes = 0
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def sound_nbytes(sound) -> int:
+    """Decoded PCM size of a pygame Sound at the mixer's current format."""
+    import pygame
+    init = pygame.mixer.get_init()
+    if not init:
+        return 0
+    freq, fmt, channels = init
+    return int(sound.get_length() * freq * channels * (abs(fmt) // 8))
+
+
+class SoundCache:
+    """Size-bounded LRU of decoded pygame Sound objects.
+
+    Clips are decoded straight from the in-memory bytes, so replaying a
+    recent clip skips both disk I/O and the Vorbis decode.
+    """
+
+    def __init__(self, max_bytes: int = SOUND_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()  # content hash -> (sound, nbytes)
+        self._bytes = 0
+
+    def get(self, key: str, data):
+        """Return the cached Sound for key, decoding data on a miss."""
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+            return item[0]
+        import pygame
+        with span("decode_sound", "preview", bytes=len(data)):
+            sound = pygame.mixer.Sound(file=io.BytesIO(data))
+        nbytes = sound_nbytes(sound)
+        self._items[key] = (sound, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self._bytes -= evicted
+        return sound
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
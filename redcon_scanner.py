@@ -0,0 +1,178 @@
+# Redcon .pk scanning engine shared by the extractors and the GUI
+import re
+import struct
+from contextlib import contextmanager
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from redcon_archive import PkArchive
+
+RIFF_SIGNATURE = b"RIFF"
+WEBP_SIGNATURE = b"WEBP"
+OGG_SIGNATURE = b"OggS"
+OGG_PAGE_HEADER_SIZE = 27
+OGG_EOS_FLAG = 0x04
+
+
+class AssetRecord(NamedTuple):
+    offset: int
+    size: int
+    kind: str  # 'webp' or 'ogg'
+
+
+class _ViewBuffer:
+    """A memoryview with find()/rfind(), so slices of a mapping are searched in place."""
+    __slots__ = ("view",)
+
+    def __init__(self, view: memoryview):
+        self.view = view.cast("B") if view.format != "B" else view
+
+    def find(self, sub: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        # re searches any buffer without copying it
+        match = re.compile(re.escape(sub)).search(self.view, start, len(self.view) if end is None else end)
+        return match.start() if match else -1
+
+    def rfind(self, sub: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        last = -1
+        for match in re.compile(re.escape(sub)).finditer(self.view, start, len(self.view) if end is None else end):
+            last = match.start()
+        return last
+
+    def __getitem__(self, key):
+        return self.view[key]
+
+    def __len__(self):
+        return len(self.view)
+
+
+@contextmanager
+def open_source(source):
+    """Yield a searchable buffer for a path, mmap, bytes, bytearray or memoryview.
+
+    Paths are memory-mapped and views are searched where they point, so
+    scanning never copies the archive into Python memory.
+    """
+    if isinstance(source, str):
+        with PkArchive(source) as archive:
+            yield archive.buffer
+    elif isinstance(source, memoryview):
+        whole = hasattr(source.obj, "find") and source.nbytes == len(source.obj) and source.contiguous
+        yield source.obj if whole else _ViewBuffer(source)
+    else:
+        yield source
+
+
+def webp_entry_size(buf, idx: int) -> int:
+    """Size of the RIFF/WEBP block at idx (clamped to the buffer), or 0 if it is not one."""
+    length = len(buf)
+    # check for "WEBP" at idx+8
+    if idx + 12 <= length and buf[idx + 8:idx + 12] == WEBP_SIGNATURE:
+        full_size = struct.unpack("<I", buf[idx + 4:idx + 8])[0] + 8
+        return min(full_size, length - idx)
+    return 0
+
+
+def ogg_stream_end(buf, start: int) -> int:
+    """Walk contiguous Ogg pages from start; return the end of the last complete page.
+
+    Stops after the end-of-stream page, at the first incomplete page, or when
+    the next page does not begin right after the previous one.
+    """
+    length = len(buf)
+    pos = start
+    while pos + OGG_PAGE_HEADER_SIZE <= length:
+        header_type_flag = buf[pos + 5]
+        segment_count = buf[pos + 26]
+
+        seg_table_end = pos + OGG_PAGE_HEADER_SIZE + segment_count
+        if seg_table_end > length:
+            break
+        end = seg_table_end + sum(buf[pos + OGG_PAGE_HEADER_SIZE:seg_table_end])
+        if end > length:
+            break
+        pos = end
+
+        if header_type_flag & OGG_EOS_FLAG:
+            break
+        # Must start next page with "OggS"
+        if buf[pos:pos + 4] != OGG_SIGNATURE:
+            break
+    return pos
+
+
+def ogg_entry_size(buf, idx: int) -> int:
+    """Size of the complete Ogg stream starting at idx, or 0 if no page parses."""
+    return ogg_stream_end(buf, idx) - idx
+
+
+# kind -> (signature, parser returning the entry size at a signature hit)
+FORMATS = {
+    "webp": (RIFF_SIGNATURE, webp_entry_size),
+    "ogg": (OGG_SIGNATURE, ogg_entry_size),
+}
+KINDS = tuple(FORMATS)
+KIND_FILE_TYPES = {"webp": "Image", "ogg": "Audio"}
+FILE_TYPE_KINDS = {ftype: kind for kind, ftype in KIND_FILE_TYPES.items()}
+FILE_TYPE_EXTENSIONS = {"Image": ".webp", "Audio": ".ogg"}
+
+
+def entry_name(index: int, file_type: str) -> str:
+    """Name the GUI and CLI give the index-th scanned entry, e.g. 'audio_0003.ogg'."""
+    return f"{file_type.lower()}_{index:04d}{FILE_TYPE_EXTENSIONS[file_type]}"
+
+
+def iter_entries(buf, kinds: Iterable[str] = KINDS, start: int = 0) -> Iterator[AssetRecord]:
+    """Single pass yielding every requested format in file order.
+
+    One find cursor per signature is kept and the nearest hit is parsed first.
+    A cursor is only re-searched once the scan moves past it, so each byte is
+    searched once per signature and entries never overlap.
+    """
+    formats = {kind: FORMATS[kind] for kind in kinds}
+    hits = {kind: buf.find(sig, start) for kind, (sig, _) in formats.items()}
+    while True:
+        pending = [(idx, kind) for kind, idx in hits.items() if idx != -1]
+        if not pending:
+            return
+        idx, kind = min(pending)
+        size = formats[kind][1](buf, idx)
+        if size > 0:
+            yield AssetRecord(idx, size, kind)
+            pos = idx + size
+        else:
+            pos = idx + 4  # avoid infinite loop if bad data
+        for other, other_idx in hits.items():
+            if other_idx != -1 and other_idx < pos:
+                hits[other] = buf.find(formats[other][0], pos)
+
+
+def iter_webp_entries(buf, start: int = 0) -> Iterator[AssetRecord]:
+    """Yield RIFF/WEBP blocks; sizes are clamped to the end of the buffer."""
+    return iter_entries(buf, ("webp",), start)
+
+
+def iter_ogg_entries(buf, start: int = 0) -> Iterator[AssetRecord]:
+    """Yield complete Ogg streams by parsing page headers."""
+    return iter_entries(buf, ("ogg",), start)
+
+
+def classify(kinds: Iterable[str]) -> str:
+    """Archive type from the kinds of the records it contains: 'webp', 'ogg', 'mixed' or 'unknown'."""
+    kinds = set(kinds)
+    if not kinds:
+        return "unknown"
+    if len(kinds) > 1:
+        return "mixed"
+    return kinds.pop()
+
+
+def sniff_archive_type(source) -> str:
+    """Kind of the first asset in source ('unknown' if none); stops at the first hit."""
+    for record in scan(source):
+        return record.kind
+    return "unknown"
+
+
+def scan(source, kinds: Iterable[str] = KINDS) -> Iterator[AssetRecord]:
+    """Lazily yield records of the requested kinds, in file order, from a path or buffer."""
+    with open_source(source) as buf:
+        yield from iter_entries(buf, kinds)
@@ -0,0 +1,50 @@
+# Redcon startup timing (phases of the GUI start, reported once everything is up)
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+class StartupTimer:
+    """Collects how long each startup phase took, from any thread.
+
+    Times are measured from origin, which should be taken as early as
+    possible (before the heavy imports) so the report covers them.
+    """
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self._phases: List[Tuple[str, float, float]] = []  # (name, start, end) relative to origin
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def record(self, name: str, start: float, end: Optional[float] = None):
+        """Record a phase that ran from start to end (default now), relative to origin."""
+        with self._lock:
+            self._phases.append((name, start, self.now() if end is None else end))
+
+    def phase(self, name: str) -> "_Phase":
+        """Context manager recording the time spent inside it."""
+        return _Phase(self, name)
+
+    def report(self) -> str:
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p[1])
+        lines = ["Startup timing (ms from launch):"]
+        for name, start, end in phases:
+            lines.append(f"  {name:<24} {start * 1000:7.0f} -> {end * 1000:7.0f}  ({(end - start) * 1000:.0f} ms)")
+        return "\n".join(lines)
+
+
+class _Phase:
+    def __init__(self, timer: StartupTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.timer.now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.record(self.name, self.start)
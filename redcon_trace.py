@@ -0,0 +1,171 @@
+# Redcon trace spans (scan/convert/patch/preview/I-O timeline, off unless enabled)
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+TRACE_ENV = "CANNONLOADER_TRACE"  # set to an output path to trace a whole session
+
+
+class Span(NamedTuple):
+    name: str
+    category: str  # 'scan', 'convert', 'patch', 'preview', 'io' or 'ui'
+    start: int  # perf_counter_ns relative to the tracer's origin
+    duration: int  # ns
+    thread: int
+    args: dict
+
+
+class Tracer:
+    """Collects finished spans from any thread."""
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.spans: List[Span] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, category: str, start: int, end: int, args: dict):
+        thread = threading.current_thread()
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self.spans.append(Span(name, category, start - self.origin, end - start, thread.ident, args))
+
+    def chrome_trace(self) -> dict:
+        """The spans in Chrome trace event format (loads in Perfetto and chrome://tracing)."""
+        with self._lock:
+            spans = list(self.spans)
+            threads = dict(self._threads)
+        events = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in threads.items()]
+        for span in spans:
+            events.append({"name": span.name, "cat": span.category, "ph": "X", "pid": self.pid, "tid": span.thread,
+                           "ts": span.start / 1000, "dur": span.duration / 1000, "args": span.args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+    def summary(self) -> str:
+        """Per-span-name table: count, total, mean and max time, and share of the traced wall time."""
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return "No trace spans recorded"
+        wall = max(s.start + s.duration for s in spans) - min(s.start for s in spans)
+        stats: Dict[tuple, List[int]] = {}
+        for span in spans:
+            stats.setdefault((span.category, span.name), []).append(span.duration)
+        lines = [f"{'stage':<10} {'span':<28} {'count':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'wall %':>7}"]
+        for (category, name), durations in sorted(stats.items(), key=lambda item: -sum(item[1])):
+            total = sum(durations)
+            lines.append(f"{category:<10} {name:<28} {len(durations):>6} {total / 1e6:>10.1f} "
+                         f"{total / len(durations) / 1e6:>9.2f} {max(durations) / 1e6:>9.2f} {100 * total / max(wall, 1):>6.1f}%")
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def set(self, **args):
+        """Attach values known only once the work is done (bytes written, hits, ...)."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add(self.name, self.category, self.start, time.perf_counter_ns(), self.args)
+
+
+class _NullSpan:
+    """Returned while tracing is off: entering, leaving and set() do nothing."""
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_tracer: Optional[Tracer] = None
+
+
+def span(name: str, category: str = "", **args):
+    """Context manager timing its body as one span; a shared no-op while tracing is off."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, category, args)
+
+
+def traced(name: str, category: str = "") -> Callable:
+    """Decorator form of span() for whole functions."""
+    def decorate(fn):
+        def wrapper(*a, **kw):
+            if _tracer is None:
+                return fn(*a, **kw)
+            with _Span(_tracer, name, category, {}):
+                return fn(*a, **kw)
+        wrapper.__name__ = fn.__name__
+        wrapper.__qualname__ = fn.__qualname__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorate
+
+
+def enable() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Stop tracing; returns the tracer with what was recorded."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active() -> Optional[Tracer]:
+    return _tracer
+
+
+def finish(path: str, stream=None):
+    """Stop tracing, write the timeline to path and the summary table to stream (stderr)."""
+    tracer = disable()
+    if tracer is None:
+        return
+    tracer.export(path)
+    print(tracer.summary(), file=stream or sys.stderr)
+    print(f"Trace written to {path}", file=stream or sys.stderr)
+
+
+def enable_from_env() -> Optional[str]:
+    """Start tracing if CANNONLOADER_TRACE names an output path; it is written at exit."""
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    enable()
+    atexit.register(finish, path)
+    return path
@@ -0,0 +1,247 @@
+# Redcon structural checks (Ogg page CRCs, RIFF sizes, overlapping entries)
+import struct
+import zlib
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from redcon_archive import PkArchive
+from redcon_scanner import (OGG_EOS_FLAG, OGG_PAGE_HEADER_SIZE, OGG_SIGNATURE, RIFF_SIGNATURE, WEBP_SIGNATURE,
+                            AssetRecord, iter_ogg_entries, iter_webp_entries, webp_entry_size)
+
+OGG_BOS_FLAG = 0x02
+OGG_CRC_OFFSET = 22
+WEBP_FIRST_CHUNKS = (b"VP8 ", b"VP8L", b"VP8X")
+_BIT_REVERSE = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+class Issue(NamedTuple):
+    offset: int
+    size: int
+    kind: str  # 'webp' or 'ogg'
+    problem: str
+
+
+def _reverse32(value: int) -> int:
+    return int(f"{value:032b}"[::-1], 2)
+
+
+def ogg_crc(data, crc: int = 0) -> int:
+    """Ogg CRC-32 (polynomial 0x04C11DB7, unreflected, no final xor), continuing from crc.
+
+    zlib only implements the reflected form, so bytes are bit-reversed on the
+    way in and the register on the way out; the per-byte work stays in C.
+    """
+    return _reverse32(zlib.crc32(bytes(data).translate(_BIT_REVERSE), _reverse32(crc) ^ 0xFFFFFFFF) ^ 0xFFFFFFFF)
+
+
+def _page_end(buf, pos: int, limit: int) -> int:
+    """End of the page at pos, or -1 if its header or body runs past limit."""
+    body = pos + OGG_PAGE_HEADER_SIZE + buf[pos + 26]
+    if body > limit:
+        return -1
+    end = body + sum(buf[pos + OGG_PAGE_HEADER_SIZE:body])
+    return end if end <= limit else -1
+
+
+def page_crc(buf, pos: int, end: int) -> int:
+    """CRC of the page in buf[pos:end], computed with its checksum field zeroed."""
+    crc = ogg_crc(buf[pos:pos + OGG_CRC_OFFSET])
+    crc = ogg_crc(b"\0\0\0\0", crc)
+    return ogg_crc(buf[pos + OGG_CRC_OFFSET + 4:end], crc)
+
+
+def check_ogg(buf, offset: int, size: int) -> List[str]:
+    """Problems with the Ogg stream in buf[offset:offset + size]; [] if it is sound.
+
+    Every page must parse, carry a correct CRC, belong to one serial number
+    in sequence, and the stream must end exactly with its end-of-stream page.
+    """
+    problems = []
+    end = offset + size
+    pos = offset
+    serial = sequence = None
+    pages = bad_crc = 0
+    first_bad = None
+    eos = False
+    while pos < end:
+        if pos + OGG_PAGE_HEADER_SIZE > end or bytes(buf[pos:pos + 4]) != OGG_SIGNATURE:
+            problems.append(f"no Ogg page at +{pos - offset}")
+            break
+        page_end = _page_end(buf, pos, end)
+        if page_end == -1:
+            problems.append(f"page at +{pos - offset} runs past the end of the entry")
+            break
+        flags = buf[pos + 5]
+        page_serial, page_sequence, stored = struct.unpack_from("<III", buf, pos + 14)
+        if buf[pos + 4] != 0:
+            problems.append(f"page {page_sequence} has unknown version {buf[pos + 4]}")
+        if serial is None:
+            serial = page_serial
+            if not flags & OGG_BOS_FLAG:
+                problems.append("first page is not marked beginning-of-stream")
+        elif page_serial != serial:
+            problems.append(f"page {page_sequence} belongs to another stream (serial {page_serial:08X})")
+        if sequence is not None and page_sequence != sequence + 1:
+            problems.append(f"page sequence jumps from {sequence} to {page_sequence}")
+        sequence = page_sequence
+        if page_crc(buf, pos, page_end) != stored:
+            bad_crc += 1
+            if first_bad is None:
+                first_bad = page_sequence
+        pages += 1
+        pos = page_end
+        eos = bool(flags & OGG_EOS_FLAG)
+        if eos:
+            break
+    if bad_crc:
+        problems.append(f"{bad_crc} of {pages} pages fail their CRC (first: page {first_bad})")
+    if pos < end and eos:
+        problems.append(f"{end - pos} bytes after the end-of-stream page")
+    elif not eos and not problems:
+        problems.append("stream has no end-of-stream page")
+    return problems
+
+
+def check_webp(buf, offset: int, size: int) -> List[str]:
+    """Problems with the RIFF/WEBP block in buf[offset:offset + size]; [] if it is sound.
+
+    The RIFF size must fit the archive and match the entry, and the chunks
+    inside must tile it exactly, starting with a VP8/VP8L/VP8X chunk.
+    """
+    if offset + 12 > len(buf) or bytes(buf[offset:offset + 4]) != RIFF_SIGNATURE \
+            or bytes(buf[offset + 8:offset + 12]) != WEBP_SIGNATURE:
+        return ["not a RIFF/WEBP block"]
+    problems = []
+    declared = struct.unpack_from("<I", buf, offset + 4)[0] + 8
+    if offset + declared > len(buf):
+        problems.append(f"RIFF size {declared} runs {offset + declared - len(buf)} bytes past the end of the archive")
+    elif declared != size:
+        problems.append(f"RIFF size {declared} does not match the entry size {size}")
+    riff_end = min(offset + declared, len(buf))
+    pos = offset + 12
+    first = None
+    while pos + 8 <= riff_end:
+        fourcc = bytes(buf[pos:pos + 4])
+        chunk_size = struct.unpack_from("<I", buf, pos + 4)[0]
+        first = first or fourcc
+        pos += 8 + chunk_size + (chunk_size & 1)
+        if pos > riff_end:
+            problems.append(f"chunk {fourcc!r} of {chunk_size} bytes runs past the RIFF end")
+            break
+    if first is None:
+        problems.append("RIFF block holds no chunks")
+    elif first not in WEBP_FIRST_CHUNKS:
+        problems.append(f"first chunk {first!r} is not VP8, VP8L or VP8X")
+    elif pos < riff_end:
+        problems.append(f"{riff_end - pos} stray bytes before the RIFF end")
+    return problems
+
+
+CHECKS = {"webp": check_webp, "ogg": check_ogg}
+
+
+def check_entry(buf, record: AssetRecord) -> List[str]:
+    return CHECKS[record.kind](buf, record.offset, record.size)
+
+
+def verify_entries(buf, records: Iterable[AssetRecord]) -> List[Issue]:
+    """Issues for each record (bad CRCs, sizes, ...) and for records overlapping an earlier one."""
+    issues = []
+    previous = None  # record reaching furthest so far
+    for record in sorted(records):
+        for problem in check_entry(buf, record):
+            issues.append(Issue(record.offset, record.size, record.kind, problem))
+        if previous is not None and record.offset < previous.offset + previous.size:
+            issues.append(Issue(record.offset, record.size, record.kind,
+                                f"overlaps the {previous.kind} entry at 0x{previous.offset:08X}"))
+        if previous is None or record.offset + record.size > previous.offset + previous.size:
+            previous = record
+    return issues
+
+
+def verify_buffer(buf) -> Tuple[List[AssetRecord], List[Issue]]:
+    """Scan buf and check everything in it -> (records, issues).
+
+    Each format is scanned on its own, so a RIFF size that swallows the next
+    entry shows up as an overlap instead of hiding it as the combined scan
+    would. Hits inside another entry only count when they verify cleanly,
+    i.e. they are real entries rather than signature bytes in compressed data.
+    """
+    webp = list(iter_webp_entries(buf))
+    ogg = list(iter_ogg_entries(buf))
+    # A broken RIFF also hides the WebP entries it swallowed from its own scan
+    for record in [r for r in webp if check_entry(buf, r)]:
+        end = record.offset + record.size
+        pos = buf.find(RIFF_SIGNATURE, record.offset + 4, end)
+        while pos != -1:
+            size = webp_entry_size(buf, pos)
+            if size and not check_webp(buf, pos, size):
+                webp.append(AssetRecord(pos, size, "webp"))
+            pos = buf.find(RIFF_SIGNATURE, pos + max(size, 4), end)
+    records = []
+    for record in sorted(webp + ogg):
+        if records and record.offset < records[-1].offset + records[-1].size and check_entry(buf, record):
+            continue
+        records.append(record)
+    return records, verify_entries(buf, records)
+
+
+def verify_file(pk_path: str) -> Tuple[List[AssetRecord], List[Issue]]:
+    with PkArchive(pk_path) as archive:
+        return verify_buffer(archive.buffer)
+
+
+def _patch_kind(data) -> Optional[str]:
+    head = bytes(data[:12])
+    if head[:4] == RIFF_SIGNATURE and head[8:12] == WEBP_SIGNATURE:
+        return "webp"
+    if head[:4] == OGG_SIGNATURE:
+        return "ogg"
+    return None
+
+
+def verify_patches(pk_path: str, patches: Iterable[Tuple[int, object]]) -> List[Issue]:
+    """Check the entries a set of (offset, data) patches wrote into pk_path.
+
+    Zero-fill patches are skipped; every other patch must now read back from
+    the file as a complete, valid WebP or Ogg entry.
+    """
+    issues = []
+    with PkArchive(pk_path) as archive:
+        buf = archive.buffer
+        for offset, data in patches:
+            kind = _patch_kind(data)
+            if kind is None:
+                if any(data):
+                    issues.append(Issue(offset, len(data), "unknown", "replacement is neither WebP nor Ogg"))
+                continue
+            for problem in CHECKS[kind](buf, offset, len(data)):
+                issues.append(Issue(offset, len(data), kind, problem))
+    return issues
+
+
+def repair_ogg_crcs(data) -> Tuple[bytes, int]:
+    """Recompute the CRC of every page of a standalone Ogg stream -> (data, pages fixed).
+
+    Only pages that parse are touched; data that is not Ogg comes back unchanged.
+    """
+    if bytes(data[:4]) != OGG_SIGNATURE:
+        return data, 0
+    fixed = 0
+    out = None
+    pos = 0
+    while pos + OGG_PAGE_HEADER_SIZE <= len(data) and bytes(data[pos:pos + 4]) == OGG_SIGNATURE:
+        end = _page_end(data, pos, len(data))
+        if end == -1:
+            break
+        crc = page_crc(data, pos, end)
+        if struct.unpack_from("<I", data, pos + OGG_CRC_OFFSET)[0] != crc:
+            if out is None:
+                out = bytearray(data)
+            struct.pack_into("<I", out, pos + OGG_CRC_OFFSET, crc)
+            fixed += 1
+        pos = end
+    return (data if out is None else bytes(out)), fixed
+
+
+def describe(issue: Issue) -> str:
+    return f"0x{issue.offset:08X} {issue.kind}: {issue.problem}"
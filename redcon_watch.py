@@ -0,0 +1,269 @@
+# Redcon watch mode (keep a patched .pk in step with a folder of mod sources)
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from redcon_archive import PkArchive, patch_file, replace_file, slot_patches, write_patched_copy
+from redcon_convert import BulkConverter, ConversionCache, ConversionJob, match_replacements, prepare_replacement
+from redcon_index import invalidate_index
+from redcon_trace import span
+from redcon_verify import describe, verify_patches
+from redcon_workspace import named_entries, scan_file
+
+POLL_INTERVAL = 0.5  # seconds between scans of the source folder
+DEBOUNCE = 0.75  # seconds a file must keep its size and mtime before it is rebuilt
+# Editor swap/backup files and partial exports, never treated as sources
+IGNORED_SUFFIXES = ("~", ".tmp", ".part", ".swp", ".crdownload")
+
+Stat = Tuple[int, int]  # (mtime_ns, size)
+
+
+def ignored(filename: str) -> bool:
+    return filename.startswith(".") or filename.lower().endswith(IGNORED_SUFFIXES)
+
+
+def file_stat(path: str) -> Optional[Stat]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def snapshot(directory: str) -> Dict[str, Stat]:
+    """(mtime, size) of every file directly in directory; {} if it is missing."""
+    stats = {}
+    try:
+        with os.scandir(directory) as it:
+            for item in it:
+                if ignored(item.name):
+                    continue
+                try:
+                    if item.is_file():
+                        st = item.stat()
+                        stats[item.path] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    continue  # removed while listing
+    except OSError:
+        pass
+    return stats
+
+
+class ChangeDetector:
+    """Polls directories and reports files once they have settled.
+
+    A file is reported when its (mtime, size) differs from the last reported
+    state and has then stayed the same for debounce seconds, so a file an
+    editor or exporter is still writing is not picked up half-way, and a burst
+    of saves becomes one change. Each poll is one scandir per directory, which
+    behaves the same on every OS and on network or WSL mounts that do not
+    deliver inotify events.
+    """
+
+    def __init__(self, directories: Iterable[str], debounce: float = DEBOUNCE):
+        self.directories = list(directories)
+        self.debounce = debounce
+        self._known: Dict[str, Stat] = {}  # last reported state per path
+        self._pending: Dict[str, Tuple[Optional[Stat], float]] = {}  # path -> (new state or None if gone, seen at)
+
+    def _scan(self) -> Dict[str, Stat]:
+        stats = {}
+        for directory in self.directories:
+            stats.update(snapshot(directory))
+        return stats
+
+    def prime(self):
+        """Take the files as they are now as the baseline, without reporting them."""
+        self._known = self._scan()
+        self._pending.clear()
+
+    def poll(self, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """-> (changed or added paths, removed paths) that have settled since the last poll."""
+        now = time.monotonic() if now is None else now
+        current = self._scan()
+        for path in set(current) | set(self._known) | set(self._pending):
+            state = current.get(path)
+            if state == self._known.get(path):
+                self._pending.pop(path, None)  # changed back before settling
+            elif path not in self._pending or self._pending[path][0] != state:
+                self._pending[path] = (state, now)
+        changed, removed = [], []
+        for path, (state, since) in list(self._pending.items()):
+            if now - since < self.debounce:
+                continue
+            del self._pending[path]
+            if state is None:
+                self._known.pop(path, None)
+                removed.append(path)
+            else:
+                self._known[path] = state
+                changed.append(path)
+        return sorted(changed), sorted(removed)
+
+    @property
+    def settling(self) -> int:
+        """Files changed but not yet stable long enough to report."""
+        return len(self._pending)
+
+
+class WatchSession:
+    """Keeps output equal to pk_path with the files in source_dir applied.
+
+    build() converts every source and writes output from scratch; step() then
+    re-converts only the sources that changed, in parallel and through the
+    conversion cache, and patches just their slots in output in place. A
+    deleted source gets its slot's stock bytes back; a source that fails to
+    convert leaves its slot as it was. Output is rebuilt in full when it or
+    the stock archive changes behind the session's back.
+    """
+
+    def __init__(self, pk_path: str, source_dir: str, output: str, convert: bool = True, fit: bool = False,
+                 workers: Optional[int] = None, cache: Optional[ConversionCache] = None, debounce: float = DEBOUNCE):
+        if os.path.abspath(output) == os.path.abspath(pk_path):
+            raise ValueError("Watch mode patches its output in place on every change; give an output other than the stock archive")
+        self.pk_path = pk_path
+        self.source_dir = source_dir
+        self.output = output
+        self.convert = convert
+        self.fit = fit
+        self.workers = workers
+        self.cache = cache
+        self.detector = ChangeDetector([source_dir], debounce)
+        self.entries = {}  # entry name -> IndexEntry of the stock archive
+        self.sources: Dict[str, str] = {}  # entry name -> source file last converted for it
+        self.applied: Dict[str, str] = {}  # entry name -> source file whose data is in output
+        self.builds = 0
+        self._base: Optional[Stat] = None
+        self._written: Optional[Stat] = None  # output as the session last left it; None forces a rebuild
+        self._retry = False
+
+    def _sources(self) -> Dict[str, str]:
+        """Entry name -> source file; the most recently modified file wins when several match one entry."""
+        sources = {}
+        for name, path in match_replacements(self.source_dir, list(self.entries)):
+            if ignored(os.path.basename(path)):
+                continue
+            if name not in sources or (file_stat(path) or (0, 0)) > (file_stat(sources[name]) or (0, 0)):
+                sources[name] = path
+        return sources
+
+    def _convert(self, sources: Dict[str, str]) -> Tuple[List[tuple], List[dict]]:
+        """Convert sources in parallel -> (slot patches, per-entry report items sorted by offset)."""
+        jobs = [ConversionJob(name, path, self.entries[name][2] if self.convert else None)
+                for name, path in sorted(sources.items())]
+        patches = []
+        items = []
+
+        def on_result(result):
+            entry = self.entries[result.job.name]
+            data, fields = prepare_replacement(result, entry, self.fit, self.workers, self.cache)
+            if data is not None:
+                patches.extend(slot_patches(entry[0], entry[1], data))
+            items.append({"name": result.job.name, **fields})
+
+        BulkConverter(self.workers, self.cache).run(jobs, on_result)
+        items.sort(key=lambda item: item["offset"])
+        return patches, items
+
+    def _report(self, items: List[dict], restored: List[str], written: int, started: float, **extra) -> dict:
+        for item in items:
+            if "error" not in item:
+                self.applied[item["name"]] = item["source"]
+        failed = sum(1 for item in items if "error" in item)
+        self._written = file_stat(self.output)
+        self._retry = False
+        self.builds += 1
+        invalidate_index(self.output)
+        return {**extra, "replaced": len(items) - failed, "restored": len(restored), "failed": failed,
+                "patched_bytes": written, "seconds": round(time.perf_counter() - started, 3),
+                "entries": items + [{"name": name, "restored": True} for name in restored]}
+
+    def build(self, reason: str = "start") -> dict:
+        """Convert every matched source and write output from scratch."""
+        started = time.perf_counter()
+        self._written = None
+        with span("watch.build", "patch", reason=reason):
+            self.entries = named_entries(scan_file(self.pk_path))
+            self._base = file_stat(self.pk_path)
+            # Baseline first, so edits made during the build are picked up by the next step
+            self.detector.prime()
+            self.sources = self._sources()
+            self.applied = {}
+            patches, items = self._convert(self.sources)
+            tmp_path = self.output + ".tmp"
+            written = write_patched_copy(self.pk_path, tmp_path, patches)
+            issues = verify_patches(tmp_path, patches)
+            if issues:
+                os.unlink(tmp_path)
+                raise ValueError(f"Patched archive failed verification: {'; '.join(describe(i) for i in issues)}")
+            replace_file(tmp_path, self.output)
+        return self._report(items, [], written, started, rebuild=reason)
+
+    def _rebuild_reason(self) -> Optional[str]:
+        if file_stat(self.pk_path) != self._base:
+            return "stock archive changed"
+        if self._written is None:
+            return "previous build failed"
+        if file_stat(self.output) != self._written:
+            return "output changed outside the session"
+        return None
+
+    def step(self) -> Optional[dict]:
+        """Apply the source changes that have settled -> report, or None if there was nothing to do."""
+        reason = self._rebuild_reason()
+        changed, removed = self.detector.poll()
+        if reason is not None:
+            # After a failure, wait for the next edit instead of retrying on every poll
+            if self._retry and not (changed or removed) and reason == "previous build failed":
+                return None
+            return self.build(reason)
+        if not changed and not removed:
+            return None
+        started = time.perf_counter()
+        touched = set(changed) | set(removed)
+        sources = self._sources()
+        todo = {name: path for name, path in sources.items() if path in touched or self.sources.get(name) != path}
+        restored = sorted(name for name in self.applied if name not in sources)
+        self.sources = sources
+        if not todo and not restored:
+            return None
+        with span("watch.step", "patch", changed=len(todo), restored=len(restored)):
+            patches, items = self._convert(todo)
+            with PkArchive(self.pk_path) as archive:
+                for name in restored:
+                    off, size = self.entries[name][0], self.entries[name][1]
+                    patches.append((off, bytes(archive.view(off, size))))
+                    del self.applied[name]
+            if not patches:
+                return self._report(items, restored, 0, started)
+            # A failed write leaves output half-patched; _written = None rebuilds it
+            self._written = None
+            written = patch_file(self.output, patches)
+            issues = verify_patches(self.output, patches)
+        if issues:
+            return self.build("patched entries failed verification")
+        return self._report(items, restored, written, started)
+
+    def run(self, stop: threading.Event, on_report: Optional[Callable[[dict], None]] = None,
+            interval: float = POLL_INTERVAL):
+        """Build, then step every interval seconds until stop is set.
+
+        Errors (a locked output, a missing folder, ...) are reported as
+        {"error": ...} and retried on the next change instead of ending the loop.
+        """
+        report = self._guarded(self.build)
+        while True:
+            if report is not None and on_report is not None:
+                on_report(report)
+            if stop.wait(interval):
+                return
+            report = self._guarded(self.step)
+
+    def _guarded(self, fn: Callable[[], Optional[dict]]) -> Optional[dict]:
+        try:
+            return fn()
+        except (OSError, ValueError) as e:
+            self._written = None
+            self._retry = True
+            return {"error": str(e)}
@@ -1,37 +1,36 @@
 # Redcon WEBP file extraction code by wowshowman
 import os
 
+from redcon_archive import PkArchive
+from redcon_scanner import iter_webp_entries
+from redcon_trace import span
+
 #print("Redcon WEBP file extraction code by wowshowman. (tx.pk is the texture file.)")
-def extract_webp_images(pk_file, output_dir):
-    with open(pk_file, "rb") as f:
-        data = f.read()
+def extract_webp_images(pk_file, output_dir, verbose=True):
+    """Write each RIFF/WEBP image in pk_file to output_dir as soon as it is found.
 
+    The archive is memory-mapped, so only the pages being scanned or written
+    are resident. Returns a list of (offset, size, path) for every image written.
+    """
     os.makedirs(output_dir, exist_ok=True)
 
-    index = 0
-    count = 0
-    while index < len(data):
-        # Look for "RIFF"
-        if data[index:index+4] == b'RIFF' and data[index+8:index+12] == b'WEBP':
-            # Get size field (4 bytes little endian, not including first 8 bytes)
-            size = int.from_bytes(data[index+4:index+8], "little")
-            total_size = size + 8  # Add RIFF header
-
-            webp_data = data[index:index+total_size]
-            output_path = os.path.join(output_dir, f"image_{count:03}.webp")
+    images = []
+    with span("extract_webp", "io", archive=os.path.basename(pk_file)), PkArchive(pk_file) as archive:
+        for record in iter_webp_entries(archive.buffer):
+            output_path = os.path.join(output_dir, f"image_{len(images):03}.webp")
             with open(output_path, "wb") as out_f:
-                out_f.write(webp_data)
+                out_f.write(archive.view(record.offset, record.size))
 
-            print(f"Extracted: {output_path}")
-            index += total_size
-            count += 1
-        else:
-            index += 1
+            images.append((record.offset, record.size, output_path))
+            if verbose:
+                print(f"Extracted: {output_path}")
 
-    if count == 0:
-        print("No WEBP images found.")
-    else:
-        print(f"Done! {count} images extracted.")
+    if verbose:
+        if not images:
+            print("No WEBP images found.")
+        else:
+            print(f"Done! {len(images)} images extracted.")
+    return images
 
 #tx_path = input("Please specify .pk filepath. ")
 #output_path = input("Please specify output folder name. ")
@@ -0,0 +1,169 @@
+# Redcon multi-archive workspace (sm.pk, sx.pk and tx.pk opened together)
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from redcon_archive import PkArchive
+from redcon_index import IndexEntry, hash_entry, load_index, save_index
+from redcon_metadata import asset_metadata
+from redcon_scanner import KIND_FILE_TYPES, KINDS, entry_name, iter_entries
+from redcon_trace import span
+
+SCAN_MODE = "+".join(KINDS)  # sidecar index key for the formats scanned
+REDCON_ARCHIVES = ("sm.pk", "sx.pk", "tx.pk")  # music, sound effects, textures
+NAMESPACE_SEPARATOR = "/"
+
+
+def find_archives(directory: str) -> List[str]:
+    """Paths of the Redcon archives present in directory, in REDCON_ARCHIVES order."""
+    present = {name.lower(): name for name in os.listdir(directory)}
+    return [os.path.join(directory, present[name]) for name in REDCON_ARCHIVES if name in present]
+
+
+def scan_file(pk_path: str, mode: str = SCAN_MODE,
+              on_progress: Optional[Callable[[int, int], None]] = None) -> List[IndexEntry]:
+    """Entries of pk_path from its sidecar index, scanning (and saving the index) when stale.
+
+    on_progress(entries, bytes scanned) is called per entry while scanning.
+    """
+    name = os.path.basename(pk_path)
+    with span("load_index", "io", archive=name):
+        indexed = load_index(pk_path, mode)
+    if indexed is None:
+        indexed = []
+        with span("scan", "scan", archive=name) as trace, PkArchive(pk_path) as archive:
+            for rec in iter_entries(archive.buffer):
+                file_type = KIND_FILE_TYPES[rec.kind]
+                indexed.append((rec.offset, rec.size, file_type, hash_entry(archive.view(rec.offset, rec.size)),
+                                asset_metadata(archive.buffer, rec.offset, rec.size, file_type)))
+                if on_progress is not None:
+                    on_progress(len(indexed), rec.offset + rec.size)
+            trace.set(entries=len(indexed), bytes=len(archive))
+        with span("save_index", "io", archive=name):
+            save_index(pk_path, mode, indexed)
+    return indexed
+
+
+def named_entries(indexed: List[IndexEntry]) -> Dict[str, IndexEntry]:
+    """Index entries keyed by their entry name ('audio_0003.ogg')."""
+    return {entry_name(i, entry[2]): entry for i, entry in enumerate(indexed)}
+
+
+def scan_files(paths: Iterable[str], workers: Optional[int] = None,
+               on_done: Optional[Callable[[str, Optional[List[IndexEntry]], Optional[str]], None]] = None,
+               on_progress: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, List[IndexEntry]]:
+    """Scan several archives at once: current indexes load directly, the rest
+    are scanned one process per archive so they use separate cores.
+
+    on_done(path, entries, error) is called in the calling thread as each
+    archive finishes. on_progress(path, entries, bytes) only fires for an
+    archive scanned in-process, i.e. when just one needs scanning.
+    """
+    results = {}
+
+    def report(path: str, indexed: Optional[List[IndexEntry]], error: Optional[str]):
+        if indexed is not None:
+            results[path] = indexed
+        if on_done is not None:
+            on_done(path, indexed, error)
+
+    misses = []
+    for path in paths:
+        indexed = load_index(path, SCAN_MODE)
+        if indexed is None:
+            misses.append(path)
+        else:
+            report(path, indexed, None)
+
+    workers = min(workers or os.cpu_count() or 1, len(misses))
+    if workers <= 1:
+        # Not worth a process pool for a single archive
+        for path in misses:
+            try:
+                progress = None if on_progress is None else lambda n, nbytes, path=path: on_progress(path, n, nbytes)
+                report(path, scan_file(path, on_progress=progress), None)
+            except Exception as e:
+                report(path, None, str(e))
+        return results
+    # Child processes do not trace; the pool shows up as one span
+    with span("scan_pool", "scan", archives=len(misses)), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(scan_file, path): path for path in misses}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                indexed = future.result()
+            except Exception as e:
+                report(path, None, str(e))
+                continue
+            report(path, indexed, None)
+    return results
+
+
+class Workspace:
+    """Archives opened together, each under a namespace ('sx', 'tx', ...).
+
+    Entry keys are '<namespace>/<entry name>'. A workspace opened on a single
+    file without namespacing uses the empty namespace and bare entry names,
+    which is how the one-archive GUI mode works.
+    """
+
+    def __init__(self, paths: Iterable[str] = (), namespaced: bool = True):
+        self.namespaced = namespaced
+        self.archives: Dict[str, PkArchive] = {}
+        try:
+            for path in paths:
+                self.archives[self._namespace_for(path)] = PkArchive(path)
+        except Exception:
+            self.close()
+            raise
+
+    def _namespace_for(self, path: str) -> str:
+        if not self.namespaced:
+            if self.archives:
+                raise ValueError("A workspace without namespaces holds one archive")
+            return ""
+        base = os.path.splitext(os.path.basename(path))[0].lower()
+        namespace, n = base, 2
+        while namespace in self.archives:
+            namespace, n = f"{base}-{n}", n + 1
+        return namespace
+
+    def entry_key(self, namespace: str, name: str) -> str:
+        return f"{namespace}{NAMESPACE_SEPARATOR}{name}" if namespace else name
+
+    @staticmethod
+    def split_key(key: str) -> Tuple[str, str]:
+        """'sx/audio_0003.ogg' -> ('sx', 'audio_0003.ogg'); bare names have namespace ''."""
+        namespace, _, name = key.rpartition(NAMESPACE_SEPARATOR)
+        return namespace, name
+
+    def path(self, namespace: str) -> str:
+        return self.archives[namespace].path
+
+    @property
+    def paths(self) -> List[str]:
+        return [archive.path for archive in self.archives.values()]
+
+    def namespace_of(self, path: str) -> Optional[str]:
+        """Namespace of the open archive that is the file at path, if any."""
+        for namespace, archive in self.archives.items():
+            try:
+                if os.path.exists(path) and os.path.samefile(path, archive.path):
+                    return namespace
+            except OSError:
+                pass
+        return None
+
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives.clear()
+
+    def __len__(self):
+        return len(self.archives)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()